@@ -1,6 +1,11 @@
+import math
 import random
-import pygame
+import time
+import numpy as np
+from functools import partial
 from board import *
+from transposition import *
+from solver import *
 
 '''
 File: AIOpponent.py. Contains all the functions relating to the AI component of the connect 4 game
@@ -14,7 +19,8 @@ Function: player_score_eval. Evaluates the score of the player in the current ga
           represents either a center, row, column or diagonal componnents of the board. If
           any of the those components have 4 player pieces, then it means that a victory
           has occured and a score of +100 is given. A similar logic applies for 3 player pieces
-          and 2 player pieces. 
+          and 2 player pieces. For other lengths of a line the counts are taken from a full
+          array (all, all but one and all but two player pieces).
 Parameters:
     array: an array consisting of center, row, column or diagonal board positions. 
     player: numerical representation of the player in the game.
@@ -27,6 +33,7 @@ def player_score_eval(array, player):
     total_points = 0
     count_player = 0
     count_empty = 0
+    size = len(array)
 
     for position in range(len(array)):
         if array[position] == player:
@@ -34,11 +41,11 @@ def player_score_eval(array, player):
         if array[position] == 0:
             count_empty += 1
 
-    if count_player == 4:
+    if count_player == size:
         total_points += 100
-    elif count_player == 3 and count_empty == 1:
+    elif count_player == size - 1 and count_empty == 1:
         total_points += 10
-    elif count_player == 2 and count_empty == 2:
+    elif count_player == size - 2 and count_empty == 2:
         total_points += 5
 
     return total_points
@@ -52,7 +59,8 @@ Function: opponent_score_eval. Evaluates the score of the opponent in the curren
           any of the those components have 3 opponent pieces and an empty spot, then the 
           player is in a bad game state b/c the opponent is close to winning. Thus, the
           current game state is bad for the player so the total_points scored by the opponent
-          will represent a bad game state.
+          will represent a bad game state. For other lengths of a line the counts are taken
+          from a full array, as in player_score_eval.
 Parameters:
     array: an array consisting of center, row, column or diagonal board positions. 
     opponent: numerical representation of the opponent in the game.
@@ -65,6 +73,7 @@ def opponent_score_eval(array, opponent):
     total_points = 0
     count_opponent = 0
     count_empty = 0
+    size = len(array)
 
     for position in range(len(array)):
         if array[position] == opponent:
@@ -72,9 +81,9 @@ def opponent_score_eval(array, opponent):
         if array[position] == 0:
             count_empty += 1
 
-    if count_opponent == 3 and count_empty == 1:
+    if count_opponent == size - 1 and count_empty == 1:
         total_points += 90
-    elif count_opponent == 2 and count_empty == 2:
+    elif count_opponent == size - 2 and count_empty == 2:
         total_points += 10
 
     return total_points
@@ -106,7 +115,8 @@ def score_evaluation(array, player):
 
 '''
 Function: center_scoring. Helper function that evaluates the scoring for 
-          center position in the board.
+          center position in the board (the two middle columns if the number of
+          columns is even).
 Parameters:
     board: the board state.
     player: numerical representation of agents in the game.
@@ -118,8 +128,9 @@ Return:
 def center_scoring(board, player):
     mboard = board.get_board()
     center_array = []
-    for row in range(board.get_row_board()):
-        center_array.append(mboard[row][(board.get_col_board() // 2)])
+    for col in center_columns(board.get_col_board()):
+        for row in range(board.get_row_board()):
+            center_array.append(mboard[row][col])
 
     result = (center_array.count(player) * 3)
     return result
@@ -139,13 +150,14 @@ Return:
 def row_scoring(board, player):
     points = 0
     mboard = board.get_board()
+    connect = board.get_connect()
     for row in range(board.get_row_board()):
         row_array = []
         for col in range(board.get_col_board()):
             row_array.append(mboard[row][col])
-        for col in range(board.get_col_board() - 3):
+        for col in range(board.get_col_board() - connect + 1):
             temp_array = []
-            for col2 in range(col, col + 4):
+            for col2 in range(col, col + connect):
                 temp_array.append(row_array[col2])
             points += score_evaluation(temp_array, player)
     return points
@@ -165,14 +177,15 @@ Return:
 def diagonal_scoring(board, player):
     points = 0
     mboard = board.get_board()
-    for row in range(board.get_row_board() - 3):
-        for col in range(board.get_col_board() - 3):
-            window = [mboard[row + i][col + i] for i in range(4)]
+    connect = board.get_connect()
+    for row in range(board.get_row_board() - connect + 1):
+        for col in range(board.get_col_board() - connect + 1):
+            window = [mboard[row + i][col + i] for i in range(connect)]
             points += score_evaluation(window, player)
 
-    for row in range(board.get_row_board() - 3):
-        for col in range(board.get_col_board() - 3):
-            window = [mboard[row + 3 - i][col + i] for i in range(4)]
+    for row in range(board.get_row_board() - connect + 1):
+        for col in range(board.get_col_board() - connect + 1):
+            window = [mboard[row + connect - 1 - i][col + i] for i in range(connect)]
             points += score_evaluation(window, player)
 
     return points
@@ -192,13 +205,14 @@ Return:
 def column_scoring(board, player):
     points = 0
     mboard = board.get_board()
+    connect = board.get_connect()
     for col in range(board.get_col_board()):
         col_array = []
         for row in range(board.get_row_board()):
             col_array.append(mboard[row][col])
-        for row in range(board.get_row_board() - 3):
+        for row in range(board.get_row_board() - connect + 1):
             temp_array = []
-            for row2 in range(row, row + 4):
+            for row2 in range(row, row + connect):
                 temp_array.append(col_array[row2])
             points += score_evaluation(temp_array, player)
     return points
@@ -224,20 +238,69 @@ def scoring(board, player):
     return total_points
 
 
+'''
+Function: batch_scoring. Vectorized version of scoring that scores a whole batch of board
+          states at once. The cells of all windows (69 on a 6x7 board) are gathered with the
+          precomputed window table, the pieces of the player and the opponent are counted per window
+          and the counts are looked up in the window_points table. Gives exactly the same
+          points as scoring.
+Parameters:
+    boards: int array of shape (batch, rows, columns) with the 2D matrices of the boards.
+    player: numerical representation of agents in the game.
+    connect: length of a winning line. Default is 4.
+Return:
+    total_points: int array with the points of every board in the batch.
+'''
+
+
+def batch_scoring(boards, player, connect=4):
+    opponent = 2
+    if player == 2:
+        opponent = 1
+
+    boards = np.asarray(boards)
+    count, row_board, col_board = boards.shape
+    windows = boards.reshape(count, row_board * col_board)[:, window_table(row_board, col_board, connect)]
+    count_player = np.count_nonzero(windows == player, axis=2)
+    count_opponent = np.count_nonzero(windows == opponent, axis=2)
+    total_points = window_points(connect)[count_player, count_opponent].sum(axis=1)
+    center = boards[:, :, list(center_columns(col_board))]
+    total_points += np.count_nonzero(center.reshape(count, -1) == player, axis=1) * 3
+
+    return total_points
+
+
+'''
+Function: vector_scoring. Scores a single board state with batch_scoring.
+Parameters:
+    board: the board state.
+    player: numerical representation of agents in the game.
+Return:
+    total_points: points accumulated from examining all positions of the board.
+'''
+
+
+def vector_scoring(board, player):
+    return int(batch_scoring([board.get_board()], player, board.get_connect())[0])
+
+
 '''
 Function: easy. Easy level of the game. Trivial implementation of AI
-          where a random column number (depending on the column size)
-          is chosen as the spot where a connect 4 will be placed for 
-          the AI agent.
-Parameters: none.
+          where a random column that is not full is chosen as the spot
+          where a connect 4 will be placed for the AI agent.
+Parameters:
+    board: board object (must have an empty column).
+    delay: seconds to wait before answering, so the move does not appear instantly.
+           Default is 0.7.
 Return:
     random_column: randomly selected column number.
 '''
 
 
-def easy():
-    pygame.time.wait(700)
-    random_column = random.randint(0, 6)
+def easy(board, delay=0.7):
+    if delay > 0:
+        time.sleep(delay)
+    random_column = random.choice(board.empty_col())
     return random_column
 
 
@@ -245,81 +308,415 @@ def easy():
 Function: medium. Medium level of the game. Trivial implementation of AI
           where a single depth of the game is examined (a single piece is dropped 
           in every available column in the board state and the column that yields
-          the best board state (state with the best points) will be returned)
+          the best board state (state with the best points) will be returned). All
+          resulting board states are scored together with batch_scoring.
 Parameters: 
     board: board object.
+    piece: numerical representation of the agent to move. Default is 2 (the AI).
 Return:
     empty_col[index]: column that will yield the highest scoring board state.
 '''
 
 
-def medium(board):
-    score = float('-inf')
-    index = 0
+def medium(board, piece=2):
     empty_col = board.empty_col()
-    for i in range(len(empty_col)):
-        copy = copy_board(board)
-        copy.drop_piece(copy.open_row(
-            empty_col[i]), empty_col[i], 2)
-        points = scoring(copy, 2)
-        if score < points:
-            score = points
-            index = i
+    children = []
+    for col in empty_col:
+        board.play(col, piece)
+        children.append(np.array(board.get_board()))
+        board.undo()
+    points = batch_scoring(children, piece, board.get_connect())
 
-    return empty_col[index]
+    return empty_col[int(np.argmax(points))]
 
 
 '''
-Function: hard. Hard level of the game. Minimax implementation of the game.
+Function: order_moves. Orders the open columns for the search. Columns that win on the
+          spot come first, then columns that block an immediate win of the opponent,
+          then the remaining columns from the center outwards. Good moves searched first
+          make alpha-beta cut off most of the other branches. A known best move (from the
+          transposition table) is moved to the front unless a winning column exists.
+Parameters:
+    board: board object.
+    piece: numerical representation of the agent to move.
+    best: column to try first (optional).
+Return:
+    columns: list of open columns in search order.
+'''
+
+
+def order_moves(board, piece, best=None):
+    opponent = 2
+    if piece == 2:
+        opponent = 1
+
+    playable = board.playable_cells()
+    wins = board.winning_cells(piece) & playable
+    blocks = board.winning_cells(opponent) & playable
+
+    first = []
+    second = []
+    rest = []
+    for col in center_order(board.get_col_board()):
+        if not board.valid_move(col):
+            continue
+        bit = board.cell_bit(board.heights[col], col)
+        if wins & bit:
+            first.append(col)
+        elif blocks & bit:
+            second.append(col)
+        else:
+            rest.append(col)
+    columns = first + second + rest
+    if best is not None and not first and best in columns:
+        columns.remove(best)
+        columns.insert(0, best)
+    return columns
+
+
+'''
+SearchTimeout Class: Raised inside the search when the time budget of hard_timed runs out.
+'''
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+'''
+Function: alpha_beta. Minimax value of a board state with alpha-beta pruning. Branches that
+          cannot change the result (value outside of the alpha-beta window) are cut off.
+          Fail-soft: a value <= alpha is an upper bound, a value >= beta is a lower bound
+          and anything in between is the exact minimax value. With a transposition table,
+          positions already searched to the same depth are answered from the table and
+          stored best moves are searched first. Only entries of the same depth are used
+          for scores, so the result is the same as a search without the table.
+Parameters:
+    board: board object.
+    ply: depth of tree exploration.
+    alpha: best score the maximizer is already guaranteed.
+    beta: best score the minimizer is already guaranteed.
+    maximizer: boolean representation of the maximizer. (True = Maximizer)
+    table: TranspositionTable object (optional).
+    deadline: time.perf_counter() value after which SearchTimeout is raised (optional).
+    stats: SearchStats object counting the nodes, leaves, terminals, cutoffs and cache hits
+           (optional).
+Return:
+    score: score of the board state.
+'''
+
+
+def alpha_beta(board, ply, alpha, beta, maximizer, table=None, deadline=None, stats=None):
+    if stats is not None:
+        stats.nodes += 1
+    if board.terminal_node():
+        if stats is not None:
+            stats.terminals += 1
+        if board.winning_move(1):
+            return float('-inf')
+        elif board.winning_move(2):
+            return float('inf')
+        else:
+            return 0
+    if ply == 0:
+        if stats is not None:
+            stats.leaves += 1
+        return board.get_score(2)
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout()
+
+    best = None
+    if table is not None:
+        key = board.zobrist_hash
+        if not maximizer:
+            key ^= SIDE_KEY
+        entry = table.probe(key)
+        if entry is not None:
+            best = entry[4]
+            if entry[1] == ply:
+                bound = entry[2]
+                value = entry[3]
+                if bound == EXACT or (bound == LOWER and value >= beta) or (bound == UPPER and value <= alpha):
+                    if stats is not None:
+                        stats.cache_hits += 1
+                    return value
+        alpha_start = alpha
+        beta_start = beta
+
+    column = None
+    if maximizer:
+        score = float('-inf')
+        for col in order_moves(board, 2, best):
+            board.play(col, 2)
+            value = alpha_beta(board, ply - 1, alpha, beta, False, table, deadline, stats)
+            board.undo()
+            if value > score:
+                score = value
+                column = col
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if stats is not None:
+                            stats.cutoffs += 1
+                        break
+
+    else:
+        score = float('inf')
+        for col in order_moves(board, 1, best):
+            board.play(col, 1)
+            value = alpha_beta(board, ply - 1, alpha, beta, True, table, deadline, stats)
+            board.undo()
+            if value < score:
+                score = value
+                column = col
+                if score < beta:
+                    beta = score
+                    if alpha >= beta:
+                        if stats is not None:
+                            stats.cutoffs += 1
+                        break
+
+    if table is not None:
+        if score <= alpha_start:
+            bound = UPPER
+        elif score >= beta_start:
+            bound = LOWER
+        else:
+            bound = EXACT
+        table.store(key, ply, bound, score, column)
+    return score
+
+
+'''
+Function: endgame. Solves the board state exactly with the solver and turns the result into a
+          score of hard: inf if the AI (maximizer) wins, -inf if the player wins, 0 for a draw.
+Parameters:
+    board: board object.
+    maximizer: boolean representation of the maximizer. (True = Maximizer)
+    solver: Solver object.
+Return:
+    column: column position that keeps the exact result.
+    score: score of the result.
+'''
+
+
+def endgame(board, maximizer, solver):
+    piece = 1
+    if maximizer:
+        piece = 2
+    column, result, distance = solver.solve(board, piece)
+    if result == DRAW:
+        return column, 0
+    if (result == WIN) == maximizer:
+        return column, float('inf')
+    return column, float('-inf')
+
+
+'''
+Function: shortcut_move. Answers a board state without a search when possible: from the
+          opening book (the AI side only) or, once solver.endgame_cells cells or fewer are
+          empty, with the exact solver. Used by every search entry point (hard, hard_timed
+          and the parallel search) before it searches.
+Parameters:
+    board: board object (not a finished game).
+    maximizer: boolean representation of the maximizer. (True = Maximizer)
+    book: OpeningBook object (optional).
+    solver: Solver object (optional).
+    stats: SearchStats object; its source is set to "book" or "solver" (optional).
+Return:
+    (column, score, depth): answer of the book (depth of the book) or of the solver (number
+                            of empty cells).
+    None: if the board state has to be searched.
+'''
+
+
+def shortcut_move(board, maximizer, book=None, solver=None, stats=None):
+    if book is not None and maximizer:
+        entry = book.lookup(board)
+        if entry is not None:
+            if stats is not None:
+                stats.source = "book"
+            return entry[0], entry[1], book.depth
+    cells = empty_cells(board)
+    if solver is not None and cells <= solver.endgame_cells:
+        if stats is not None:
+            stats.source = "solver"
+        column, score = endgame(board, maximizer, solver)
+        return column, score, cells
+    return None
+
+
+'''
+Function: hard. Hard level of the game. Minimax implementation of the game with alpha-beta
+          pruning. Children are explored in place with board.play and board.undo, so the
+          board is left exactly as it was passed in. Among equally scored columns the
+          leftmost one is returned, like plain minimax over empty_col() does: a column left
+          of the current best is searched with a window that also accepts a tie, a column
+          right of it has to beat the best score.
 Parameters: 
     board: board object.
     ply: depth of tree exploration.
     max: boolean representation of the maximizer. (True = Maximizer)
+    table: TranspositionTable object shared between searches (optional).
+    deadline: time.perf_counter() value after which SearchTimeout is raised (optional).
+    best: column to search first, e.g. the answer of a shallower search (optional).
+    book: OpeningBook object; positions in the book are answered without a search (optional).
+    solver: Solver object; positions with solver.endgame_cells empty cells or fewer are solved
+            exactly instead (optional).
+    stats: SearchStats object; also gets the time of the search and the principal variation
+           (optional).
 Return:
     column: column position that will yield the next best step.
     score: score obtained from minimax traversal.
 '''
 
 
-def hard(board, ply, maximizer):
-    valid_locations = board.empty_col()
-    is_terminal = board.terminal_node()
+def hard(board, ply, maximizer, table=None, deadline=None, best=None, book=None, solver=None, stats=None):
+    if ply == 0 or board.terminal_node():
+        return (None, alpha_beta(board, 0, float('-inf'), float('inf'), maximizer))
 
-    if ply == 0 or is_terminal:
-        if is_terminal:
-            if board.winning_move(1):
-                return (None, float('-inf'))
-            elif board.winning_move(2):
-                return (None, float('inf'))
-            else:
-                return (None, 0)
-        else:
-            return (None, scoring(board, 2))
+    shortcut = shortcut_move(board, maximizer, book, solver, stats)
+    if shortcut is not None:
+        return shortcut[0], shortcut[1]
 
+    if table is not None:
+        table.new_search()
+    if stats is not None:
+        start = time.perf_counter()
+        nodes = stats.nodes
+
+    column = board.empty_col()[0]
     if maximizer:
         score = float('-inf')
-        column = 0
-        for col in valid_locations:
-            row = board.open_row(col)
-            copy = copy_board(board)
-            copy.drop_piece(row, col, 2)
-            value = hard(copy, ply - 1, False)[1]
-            if value > score:
+        for col in order_moves(board, 2, best):
+            if col < column:
+                alpha = math.nextafter(score, float('-inf'))
+            else:
+                alpha = score
+            board.play(col, 2)
+            value = alpha_beta(board, ply - 1, alpha, float('inf'), False, table, deadline, stats)
+            board.undo()
+            if value > score or (value == score and col < column):
                 score = value
                 column = col
 
-        return column, score
-
     else:
         score = float('inf')
-        column = 0
-        for col in valid_locations:
-            row = board.open_row(col)
-            copy = copy_board(board)
-            copy.drop_piece(row, col, 1)
-            value = hard(copy, ply - 1, True)[1]
-            if value < score:
+        for col in order_moves(board, 1, best):
+            if col < column:
+                beta = math.nextafter(score, float('inf'))
+            else:
+                beta = score
+            board.play(col, 1)
+            value = alpha_beta(board, ply - 1, float('-inf'), beta, True, table, deadline, stats)
+            board.undo()
+            if value < score or (value == score and col < column):
                 score = value
                 column = col
 
-        return column, score
+    if stats is not None:
+        stats.record_depth(ply, time.perf_counter() - start, stats.nodes - nodes, column, score)
+        stats.pv = principal_variation(board, column, ply, maximizer, table)
+    return column, score
+
+
+'''
+Function: principal_variation. Expected line of play after a search: the best column, then
+          the best moves stored in the transposition table for the positions that follow,
+          until the depth of the search, the end of the game or a position missing from the
+          table. The board is left as it was passed in.
+Parameters:
+    board: board object.
+    column: best column of the search.
+    ply: depth of the search.
+    maximizer: boolean representation of the maximizer. (True = Maximizer)
+    table: TranspositionTable object used by the search (optional; without it the line
+           only holds the best column).
+Return:
+    pv: list of columns.
+'''
+
+
+def principal_variation(board, column, ply, maximizer, table=None):
+    pv = [column]
+    piece = 2 if maximizer else 1
+    board.play(column, piece)
+    while table is not None and len(pv) < ply and not board.terminal_node():
+        maximizer = not maximizer
+        piece = 3 - piece
+        key = board.zobrist_hash
+        if not maximizer:
+            key ^= SIDE_KEY
+        entry = table.peek(key)
+        if entry is None or entry[4] is None or not board.valid_move(entry[4]):
+            break
+        pv.append(entry[4])
+        board.play(entry[4], piece)
+    for _ in pv:
+        board.undo()
+    return pv
+
+
+'''
+Function: hard_timed. Hard level of the game with a time budget instead of a fixed depth.
+          Iterative deepening: hard is run at depth 1, 2, 3, ... and every iteration searches
+          the best column of the previous one first (the transposition table orders the rest
+          of the tree). When the budget runs out the unfinished iteration is dropped, the
+          board is restored and the answer of the deepest completed iteration is returned.
+          Depth 1 always completes so there is always a move to play. The iterations from
+          depth 2 on are run by a search function, hard by default; the parallel search
+          passes its own to reuse this loop.
+Parameters: 
+    board: board object.
+    think_ms: time budget of the search in milliseconds.
+    maximizer: boolean representation of the maximizer. (True = Maximizer)
+    table: TranspositionTable object shared between searches (optional).
+    max_ply: deepest iteration to run (optional, default is the number of empty cells).
+    book: OpeningBook object; positions in the book are answered without a search (optional).
+    solver: Solver object; positions with solver.endgame_cells empty cells or fewer are solved
+            exactly instead (optional).
+    stats: SearchStats object; gets the counters and the time of all iterations (the one that
+           ran out of time included), the time of every completed depth and the principal
+           variation of the deepest one (optional).
+    search: function called as search(board, ply, maximizer, deadline=..., best=..., stats=...)
+            that searches one depth like hard and raises SearchTimeout after the deadline
+            (optional, default is hard with the table).
+Return:
+    column: column position that will yield the next best step.
+    score: score obtained from the deepest completed search.
+    depth: depth of the deepest completed search (the book depth for book moves, the number
+           of empty cells for solved positions).
+'''
+
+
+def hard_timed(board, think_ms, maximizer, table=None, max_ply=None, book=None, solver=None, stats=None,
+               search=None):
+    if not board.terminal_node():
+        shortcut = shortcut_move(board, maximizer, book, solver, stats)
+        if shortcut is not None:
+            return shortcut
+    if search is None:
+        search = partial(hard, table=table)
+
+    deadline = time.perf_counter() + think_ms / 1000
+    cells = empty_cells(board)
+    if max_ply is None or max_ply > cells:
+        max_ply = cells
+
+    column, score = hard(board, 1, maximizer, table, stats=stats)
+    depth = 1
+    moves = len(board.moves)
+    while depth < max_ply and abs(score) != float('inf'):
+        start = time.perf_counter()
+        try:
+            result = search(board, depth + 1, maximizer, deadline=deadline, best=column, stats=stats)
+        except SearchTimeout:
+            while len(board.moves) > moves:
+                board.undo()
+            if stats is not None:
+                stats.record_timeout(time.perf_counter() - start)
+            break
+        column, score = result
+        depth += 1
+
+    return column, score, depth
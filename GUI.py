@@ -2,11 +2,17 @@ from board import *
 import pygame
 
 '''
-Connect4GUI Class: Connect4GUI object is created to store all components needed to render 
+Connect4GUI Class: Connect4GUI object is created to store all components needed to render
                    a connect 4 board game using pygame. The board is created mainly using
                    rectangles and circles. The background and board structure is created first
                    and the pieces are created afterwards. This class contains all the methods
                    needed to create a connect 4 board using pygame.
+
+                   The blue board with its holes is rendered once into a cached surface and
+                   every cell sprite (a board square with a hole or a disc of one color) is
+                   rendered once per color. After the first full draw only the cells that
+                   change and the strip with the cursor disc are redrawn, and only their
+                   rectangles are pushed to the window with pygame.display.update(rects).
 '''
 
 
@@ -15,7 +21,7 @@ class Connect4GUI:
     '''
     Method: Connec4GUI constructor. Used to create a Connect4GUI object.
     Parameters:
-        pixel_square_size: the pixel size. 
+        pixel_square_size: the pixel size.
         width: width of the GUI board.
         height: height of the GUI board.
         background_color: background color of the game.
@@ -38,6 +44,12 @@ class Connect4GUI:
         self.P1_color = P1_color
         self.P2_color = P2_color
 
+        # surfaces rendered on first use
+        self.board_surface = None
+        self.cells = {}
+        self.discs = {}
+        self.cursor_rect = None
+
     '''
     Method: get_size. Getter for size attribute.
     Parameters: none.
@@ -56,6 +68,172 @@ class Connect4GUI:
     def get_radius(self):
         return self.radius
 
+    '''
+    Method: get_screen. Surface of the game window. The window is only opened (set_mode) if
+            there is none yet.
+    Parameters: none.
+    Return: screen surface.
+    '''
+
+    def get_screen(self):
+        screen = pygame.display.get_surface()
+        if screen is None or screen.get_size() != self.size:
+            screen = pygame.display.set_mode(self.size)
+        return screen
+
+    '''
+    Method: get_board_surface. Blue board with its holes, rendered once.
+    Parameters: none.
+    Return: board surface (the size of the window, the top strip left in the background color).
+    '''
+
+    def get_board_surface(self):
+        if self.board_surface is None:
+            surface = pygame.Surface(self.size)
+            surface.fill(self.background_color)
+            hole = self.get_cell(self.background_color)
+            for col in range(self.board.get_col_board()):
+                for row in range(self.board.get_row_board()):
+                    surface.blit(hole, self.cell_rect(row, col))
+            self.board_surface = surface
+        return self.board_surface
+
+    '''
+    Method: get_cell. Sprite of one board square with a hole of the given color (the
+            background color for an empty hole, a player color for a disc), rendered once
+            per color.
+    Parameters:
+        color: color of the hole.
+    Return: cell surface.
+    '''
+
+    def get_cell(self, color):
+        cell = self.cells.get(color)
+        if cell is None:
+            cell = pygame.Surface((self.pixel_square_size, self.pixel_square_size))
+            cell.fill(self.board_color)
+            center = int(self.pixel_square_size / 2)
+            pygame.draw.circle(cell, color, (center, center), self.radius)
+            self.cells[color] = cell
+        return cell
+
+    '''
+    Method: get_disc. Sprite of a disc of the given color on the background color (the disc
+            above the board), rendered once per color.
+    Parameters:
+        color: color of the disc.
+    Return: disc surface.
+    '''
+
+    def get_disc(self, color):
+        disc = self.discs.get(color)
+        if disc is None:
+            disc = pygame.Surface((self.pixel_square_size, self.pixel_square_size))
+            disc.fill(self.background_color)
+            center = int(self.pixel_square_size / 2)
+            pygame.draw.circle(disc, color, (center, center), self.radius)
+            self.discs[color] = disc
+        return disc
+
+    '''
+    Method: cell_rect. Window rectangle of a board cell (row 0 is the bottom row).
+    Parameters:
+        row: row of the cell.
+        col: column of the cell.
+    Return: pygame.Rect of the cell.
+    '''
+
+    def cell_rect(self, row, col):
+        return pygame.Rect(col * self.pixel_square_size, self.height - (row + 1) * self.pixel_square_size,
+                           self.pixel_square_size, self.pixel_square_size)
+
+    '''
+    Method: strip_rect. Window rectangle of the strip above the board.
+    Parameters: none.
+    Return: pygame.Rect of the strip.
+    '''
+
+    def strip_rect(self):
+        return pygame.Rect(0, 0, self.width, self.pixel_square_size)
+
+    '''
+    Method: draw_cell. Draws one cell of the board as it is on the board object.
+    Parameters:
+        row: row of the cell.
+        col: column of the cell.
+    Return: pygame.Rect of the cell.
+    '''
+
+    def draw_cell(self, row, col):
+        piece = (self.board.get_board())[row][col]
+        if piece == 1:
+            color = self.P1_color
+        elif piece == 2:
+            color = self.P2_color
+        else:
+            color = self.background_color
+        rect = self.cell_rect(row, col)
+        self.get_screen().blit(self.get_cell(color), rect)
+        return rect
+
+    '''
+    Method: draw_move. Draws the cell of a piece that was just dropped and updates only that
+            cell of the window.
+    Parameters:
+        row: row of the piece.
+        col: column of the piece.
+    Return: pygame.Rect of the cell.
+    '''
+
+    def draw_move(self, row, col):
+        rect = self.draw_cell(row, col)
+        pygame.display.update(rect)
+        return rect
+
+    '''
+    Method: draw_cursor. Moves the disc in the strip above the board and updates only the
+            part of the strip that changed.
+    Parameters:
+        posx: x position of the center of the disc.
+        color: color of the disc; None only clears the previous disc.
+    Return: none.
+    '''
+
+    def draw_cursor(self, posx, color=None):
+        screen = self.get_screen()
+        rects = []
+        if self.cursor_rect is not None:
+            screen.fill(self.background_color, self.cursor_rect)
+            rects.append(self.cursor_rect)
+            self.cursor_rect = None
+        if color is not None:
+            rect = pygame.Rect(int(posx - self.pixel_square_size / 2), 0,
+                               self.pixel_square_size, self.pixel_square_size)
+            screen.blit(self.get_disc(color), rect)
+            rects.append(rect)
+            self.cursor_rect = rect
+        if rects:
+            pygame.display.update(rects)
+
+    '''
+    Method: draw_strip. Clears the strip above the board (cursor included) and optionally
+            shows a text in it.
+    Parameters:
+        label: rendered text surface (optional).
+        position: position of the text in the window. Default is (20, 25).
+    Return: none.
+    '''
+
+    def draw_strip(self, label=None, position=(20, 25)):
+        screen = self.get_screen()
+        rect = self.strip_rect()
+        screen.fill(self.background_color, rect)
+        self.cursor_rect = None
+        if label is not None:
+            screen.blit(label, position)
+            rect = rect.union(label.get_rect(topleft=position))
+        pygame.display.update(rect)
+
     '''
     Method: draw_pieces. Helper method that draws the circular connect 4 pieces.
     Parameters: none.
@@ -63,15 +241,10 @@ class Connect4GUI:
     '''
 
     def draw_pieces(self):
-        screen = pygame.display.set_mode(self.size)
         for col in range(self.board.get_col_board()):
             for row in range(self.board.get_row_board()):
-                if (self.board.get_board())[row][col] == 1:
-                    pygame.draw.circle(screen, self.P1_color, (
-                        int(col * self.pixel_square_size + self.pixel_square_size / 2), self.height - int(row * self.pixel_square_size + self.pixel_square_size / 2)), self.radius)
-                elif (self.board.get_board())[row][col] == 2:
-                    pygame.draw.circle(screen, self.P2_color, (
-                        int(col * self.pixel_square_size + self.pixel_square_size / 2), self.height - int(row * self.pixel_square_size + self.pixel_square_size / 2)), self.radius)
+                if (self.board.get_board())[row][col] != 0:
+                    self.draw_cell(row, col)
 
     '''
     Method: draw_background_board. Helper method that draws the background and board of the game.
@@ -80,13 +253,8 @@ class Connect4GUI:
     '''
 
     def draw_background_board(self):
-        screen = pygame.display.set_mode(self.size)
-        for col in range(self.board.get_col_board()):
-            for row in range(self.board.get_row_board()):
-                pygame.draw.rect(screen, self.board_color, (col * self.pixel_square_size, row *
-                                                            self.pixel_square_size + self.pixel_square_size, self.pixel_square_size, self.pixel_square_size))
-                pygame.draw.circle(screen, self.background_color, (
-                    int(col * self.pixel_square_size + self.pixel_square_size / 2), int(row * self.pixel_square_size + self.pixel_square_size + self.pixel_square_size / 2)), self.radius)
+        self.get_screen().blit(self.get_board_surface(), (0, 0))
+        self.cursor_rect = None
 
     '''
     Method: draw_game. Draws all components of the connect 4 game.
@@ -95,7 +263,6 @@ class Connect4GUI:
     '''
 
     def draw_game(self):
-        screen = pygame.display.set_mode(self.size)
         self.draw_background_board()
         self.draw_pieces()
         pygame.display.update()
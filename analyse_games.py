@@ -0,0 +1,278 @@
+import argparse
+import heapq
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from board import *
+from AIOpponent import *
+import parallel
+from transposition import TranspositionTable
+from game_record import DEFAULT_LOG, parse_record, read_records
+
+'''
+File: analyse_games.py. Batch analysis of a game log (see game_record.py). The log is streamed
+                        one game at a time into a pool of worker processes, which replay every
+                        game and search every position of the AI (both sides if the record has
+                        no ai field) with the hard level. The move that was played is compared
+                        with the best move of the search at the same depth and flagged as:
+                            missed win   the search finds a win, the played move does not win
+                            losing move  the played move loses, another move does not
+                            weak move    the played move scores at least --threshold points
+                                         below the best move
+                        Moves of a random opening (the opening=N field of arena.py records)
+                        are not analysed. At the end, the time spent per move number is
+                        reported: the time the move took in the game (from the ms field of the
+                        records) and the time its analysis took. The worker processes set up
+                        their transposition tables with the initializer of parallel.py.
+
+                        Only a bounded number of games is in flight at any time, so logs of any
+                        size are analysed in constant memory and the flagged moves are printed
+                        in the order of the log as soon as they are known.
+'''
+
+MISSED_WIN = "missed win"
+LOSING_MOVE = "losing move"
+WEAK_MOVE = "weak move"
+
+'''
+Function: classify_move. Compares the score of the played move with the score of the best move,
+          both from the side of the piece that moved.
+Parameters:
+    best: score of the best move.
+    played: score of the played move.
+    threshold: points lost from which a move counts as weak.
+Return:
+    kind: MISSED_WIN, LOSING_MOVE or WEAK_MOVE, or None if the move is fine.
+'''
+
+
+def classify_move(best, played, threshold):
+    if played >= best:
+        return None
+    if best == float('inf'):
+        return MISSED_WIN
+    if played == float('-inf'):
+        return LOSING_MOVE
+    if best - played >= threshold:
+        return WEAK_MOVE
+    return None
+
+
+'''
+Function: analyse_game. Task of the worker processes: replays one game and searches the
+          positions of the AI.
+Parameters:
+    line: record line of the game.
+    depth: depth of tree exploration of every position.
+    threshold: points lost from which a move counts as weak.
+Return:
+    moves: number of moves of the game.
+    flagged: list of (ply, piece, played column, best column, played score, best score, kind)
+             of the flagged moves; scores are from the side of the piece that moved.
+    move_ms: milliseconds every move took in the game (empty if the record has no times).
+    analysis: list of (ply, seconds) with the time the analysis of every searched move took.
+Raises:
+    ValueError: if the record is not valid.
+'''
+
+
+def analyse_game(line, depth, threshold):
+    record = parse_record(line)
+    board = Board(*record.size)
+    # table of the worker process, set up by parallel.init_worker
+    table = parallel.worker_table
+    if table is None:
+        table = TranspositionTable()
+    opening = int(record.extra.get("opening", 0))
+    flagged = []
+    analysis = []
+    for ply, col in enumerate(record.moves):
+        piece = record.piece_to_move(ply)
+        if board.terminal_node() or not board.valid_move(col):
+            raise ValueError("move %d (column %d) is not valid" % (ply + 1, col + 1))
+        if ply >= opening and (record.ai is None or piece == record.ai):
+            start = time.perf_counter()
+            maximizer = piece == 2
+            best_col, best = hard(board, depth, maximizer, table)
+            if col == best_col:
+                played = best
+            else:
+                board.play(col, piece)
+                played = alpha_beta(board, depth - 1, float('-inf'), float('inf'), not maximizer, table)
+                board.undo()
+            # scores of the search are for piece 2
+            if not maximizer:
+                best, played = -best, -played
+            kind = classify_move(best, played, threshold)
+            if kind is not None:
+                flagged.append((ply, piece, col, best_col, played, best, kind))
+            analysis.append((ply, time.perf_counter() - start))
+        board.play(col, piece)
+    return len(record.moves), flagged, record.times, analysis
+
+
+'''
+Function: analyse_log. Streams the games of a log through a pool of worker processes. At most
+          window games are queued at a time; results come back in the order of the log.
+Parameters:
+    path: game log.
+    depth: depth of tree exploration of every position.
+    threshold: points lost from which a move counts as weak.
+    workers: number of worker processes (default: CPUs).
+    window: number of games in flight. Default is 4 per worker.
+    table_size: number of slots of the transposition table of every worker.
+Return:
+    generator of (line number, result of analyse_game or the ValueError of an invalid record).
+'''
+
+
+def analyse_log(path, depth=4, threshold=100, workers=None, window=None, table_size=1 << 18):
+    if window is None:
+        window = 4 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=parallel.init_worker, initargs=(table_size,)) as executor:
+        pending = deque()
+        for number, line in read_records(path):
+            pending.append((number, executor.submit(analyse_game, line, depth, threshold)))
+            if len(pending) >= window:
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+
+
+'''
+Function: finish. Waits for the analysis of one game.
+Parameters:
+    number: line number of the game in the log.
+    future: future of analyse_game.
+Return:
+    number: line number of the game.
+    result: result of analyse_game, or the ValueError of an invalid record.
+'''
+
+
+def finish(number, future):
+    try:
+        return number, future.result()
+    except ValueError as error:
+        return number, error
+
+
+'''
+Function: format_score. Score as text: win, loss or the number of points.
+Parameters:
+    score: score of a move.
+Return:
+    text: score as text.
+'''
+
+
+def format_score(score):
+    if score == float('inf'):
+        return "win"
+    if score == float('-inf'):
+        return "loss"
+    return "%g" % score
+
+
+'''
+TimeReport Class: Time spent per move number over all analysed games: the time the moves took
+                  in the games and the time their analysis took, and the slowest moves.
+'''
+
+
+class TimeReport:
+
+    '''
+    Method: TimeReport constructor.
+    Parameters:
+        slowest: number of slowest moves kept. Default is 5.
+    Return: none
+    '''
+
+    def __init__(self, slowest=5):
+        self.move_ms = {}
+        self.analysis = {}
+        self.slowest = []
+        self.keep = slowest
+
+    '''
+    Method: add_game. Adds the times of one analysed game.
+    Parameters:
+        number: line number of the game in the log.
+        move_ms: milliseconds every move took in the game.
+        analysis: list of (ply, seconds) of the analysed moves.
+    Return: none
+    '''
+
+    def add_game(self, number, move_ms, analysis):
+        for ply, ms in enumerate(move_ms):
+            total = self.move_ms.setdefault(ply, [0, 0])
+            total[0] += 1
+            total[1] += ms
+            entry = (ms, number, ply)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+        for ply, seconds in analysis:
+            total = self.analysis.setdefault(ply, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+
+    '''
+    Method: print_report. Prints the average time of every move number and the slowest moves.
+    Parameters: none
+    Return: none
+    '''
+
+    def print_report(self):
+        print("%5s %7s %10s %9s %12s" % ("move", "games", "game ms", "analysed", "analysis ms"))
+        for ply in sorted(set(self.move_ms) | set(self.analysis)):
+            games, ms = self.move_ms.get(ply, (0, 0))
+            analysed, seconds = self.analysis.get(ply, (0, 0.0))
+            print("%5d %7d %10s %9d %12s" % (
+                ply + 1, games, "%.1f" % (ms / games) if games else "-", analysed,
+                "%.1f" % (seconds / analysed * 1000) if analysed else "-"))
+        if self.slowest:
+            print("slowest moves: " + ", ".join("line %d move %d %d ms" % (number, ply + 1, ms)
+                                                for ms, number, ply in sorted(self.slowest, reverse=True)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse a game log and flag the mistakes of the AI.")
+    parser.add_argument("log", nargs="?", default=DEFAULT_LOG, help="game log (default games.log)")
+    parser.add_argument("--depth", type=int, default=4, help="search depth per position (default 4)")
+    parser.add_argument("--threshold", type=float, default=100,
+                        help="points lost from which a move is flagged as weak (default 100)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPUs)")
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error("--depth must be at least 1")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    report = TimeReport()
+    counts = {MISSED_WIN: 0, LOSING_MOVE: 0, WEAK_MOVE: 0}
+    games = positions = errors = 0
+    start = time.perf_counter()
+    for number, result in analyse_log(args.log, args.depth, args.threshold, args.workers):
+        if isinstance(result, ValueError):
+            errors += 1
+            print("line %d: invalid record: %s" % (number, result))
+            continue
+        moves, flagged, move_ms, analysis = result
+        games += 1
+        positions += len(analysis)
+        for ply, piece, col, best_col, played, best, kind in flagged:
+            counts[kind] += 1
+            print("line %d move %d: piece %d played %d (%s), best %d (%s): %s" % (
+                number, ply + 1, piece, col + 1, format_score(played), best_col + 1, format_score(best), kind))
+        report.add_game(number, move_ms, analysis)
+    elapsed = time.perf_counter() - start
+
+    print("%d games, %d positions at depth %d in %.1f s (%.1f positions/s), %d invalid records"
+          % (games, positions, args.depth, elapsed, positions / elapsed if elapsed > 0 else 0.0, errors))
+    print("flagged: %d missed wins, %d losing moves, %d weak moves"
+          % (counts[MISSED_WIN], counts[LOSING_MOVE], counts[WEAK_MOVE]))
+    report.print_report()
@@ -0,0 +1,308 @@
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from board import *
+from engine import Engine
+from game_record import GameRecord, append_record
+
+'''
+File: arena.py. Self-play arena: plays many games between two AI configurations in a pool of
+                worker processes and reports the results (wins, draws, losses and an Elo
+                estimate) and the speed (games per second and move latency). Used to check
+                that a change to the search does not make the AI weaker or slower.
+
+                A configuration is written as LEVEL[:LIMIT]: "easy", "medium", "perfect",
+                "hard" (depth 4), "hard:6" (depth 6) or "hard:200ms" (200 ms per move).
+                The opening book and the endgame solver of the hard level are off unless
+                --book and --endgame-cells turn them on, so a weaker search is not hidden
+                behind book moves and a perfect endgame.
+
+                Every game starts from a random opening of a few plies. Games come in pairs
+                with the same opening, each side playing first once, so neither side gets
+                the advantage of the first move more often than the other.
+
+                With --record, every game is appended to a game log (see game_record.py), to
+                be analysed with analyse_games.py.
+'''
+
+# engines of the worker process, one per configuration, kept between games
+worker_engines = {}
+
+
+'''
+Function: parse_player. Parses a configuration string.
+Parameters:
+    spec: configuration, e.g. "easy", "hard:6" or "hard:200ms".
+Return:
+    level: level of the engine.
+    ply: depth of the hard level (None for a time budget).
+    think_ms: time budget of the hard level in milliseconds (None for a fixed depth).
+Raises:
+    ValueError: if the configuration is not valid.
+'''
+
+
+def parse_player(spec):
+    level, _, limit = spec.partition(":")
+    if level not in ("easy", "medium", "hard", "perfect"):
+        raise ValueError("unknown level %r" % level)
+    if limit and level != "hard":
+        raise ValueError("only the hard level takes a depth or time limit: %r" % spec)
+    ply = 4
+    think_ms = None
+    if limit.endswith("ms"):
+        ply = None
+        think_ms = int(limit[:-2])
+    elif limit:
+        ply = int(limit)
+    if (ply is not None and ply < 1) or (think_ms is not None and think_ms < 1):
+        raise ValueError("limit must be at least 1: %r" % spec)
+    return level, ply, think_ms
+
+
+'''
+Function: get_engine. Engine of a configuration in the current worker process, created on
+          first use.
+Parameters:
+    spec: configuration string.
+    use_book: use the opening book. Default is False.
+    endgame_cells: the hard level solves the game exactly from this number of empty cells
+                   on; 0 turns it off. Default is 0.
+Return:
+    engine: Engine object.
+'''
+
+
+def get_engine(spec, use_book=False, endgame_cells=0):
+    key = (spec, use_book, endgame_cells)
+    engine = worker_engines.get(key)
+    if engine is None:
+        level, ply, think_ms = parse_player(spec)
+        engine = Engine(level, ply, think_ms, use_book=use_book, endgame_cells=endgame_cells, move_delay=0)
+        worker_engines[key] = engine
+    return engine
+
+
+'''
+Function: random_opening. Plays random moves from the empty board; openings that end the
+          game are drawn again.
+Parameters:
+    plies: number of random moves.
+    seed: seed of the opening.
+Return:
+    moves: list of columns.
+'''
+
+
+def random_opening(plies, seed):
+    rng = random.Random(seed)
+    board = Board()
+    while True:
+        moves = []
+        piece = 1
+        for ply in range(plies):
+            col = rng.choice(board.empty_col())
+            board.play(col, piece)
+            moves.append(col)
+            piece = 3 - piece
+            if board.terminal_node():
+                break
+        ended = board.terminal_node()
+        while board.moves:
+            board.undo()
+        if not ended:
+            return moves
+
+
+'''
+Function: play_game. Task of the worker processes: plays one game between two configurations.
+          Piece 1 moves first.
+Parameters:
+    first: configuration playing piece 1.
+    second: configuration playing piece 2.
+    opening: list of opening columns, played before the engines move.
+    seed: seed of the random generator used by the easy level.
+    use_book: use the opening book. Default is False.
+    endgame_cells: empty cells from which the hard level solves the game exactly; 0 turns
+                   it off. Default is 0.
+Return:
+    winner: 1 or 2 for the piece that won, 0 for a draw.
+    moves: number of moves of the game, opening included.
+    times: seconds spent by the first and the second configuration on their moves.
+    counts: number of moves made by the first and the second configuration.
+    record: GameRecord of the game (opening moves take 0 ms).
+'''
+
+
+def play_game(first, second, opening, seed, use_book=False, endgame_cells=0):
+    random.seed(seed)
+    engines = {1: get_engine(first, use_book, endgame_cells), 2: get_engine(second, use_book, endgame_cells)}
+    times = {1: 0.0, 2: 0.0}
+    counts = {1: 0, 2: 0}
+    board = Board()
+    record = GameRecord()
+    record.extra["player1"] = first
+    record.extra["player2"] = second
+    record.extra["opening"] = len(opening)
+    piece = 1
+    for col in opening:
+        board.play(col, piece)
+        record.add_move(col, 0)
+        piece = 3 - piece
+
+    while not board.terminal_node():
+        start = time.perf_counter()
+        col = engines[piece].analyse(board, piece)[0]
+        elapsed = time.perf_counter() - start
+        times[piece] += elapsed
+        counts[piece] += 1
+        board.play(col, piece)
+        record.add_move(col, elapsed)
+        piece = 3 - piece
+
+    record.result = board.get_winner()
+    return board.get_winner(), len(board.moves), (times[1], times[2]), (counts[1], counts[2]), record
+
+
+'''
+Function: elo_difference. Elo difference that gives an expected score.
+Parameters:
+    score: expected score between 0 and 1 (a win counts 1, a draw 0.5).
+Return:
+    elo: Elo difference (infinite for a score of 0 or 1).
+'''
+
+
+def elo_difference(score):
+    if score <= 0:
+        return float('-inf')
+    if score >= 1:
+        return float('inf')
+    return -400 * math.log10(1 / score - 1)
+
+
+'''
+Function: run_arena. Plays a match between two configurations and prints the report.
+Parameters:
+    player_a: configuration of the first player.
+    player_b: configuration of the second player.
+    games: number of games (rounded up to an even number, games come in pairs).
+    workers: number of worker processes.
+    opening_plies: number of random moves of every opening.
+    seed: seed of the openings.
+    record_path: game log every game is appended to (optional).
+    use_book: use the opening book. Default is False.
+    endgame_cells: empty cells from which the hard level solves the game exactly; 0 turns
+                   it off. Default is 0.
+Return:
+    report: dictionary with wins, draws, losses (for player_a), score, elo, elo_margin
+            (95% confidence), games_per_sec and the move latency of both players in ms.
+'''
+
+
+def run_arena(player_a, player_b, games, workers=None, opening_plies=2, seed=0, record_path=None, use_book=False,
+              endgame_cells=0):
+    parse_player(player_a)
+    parse_player(player_b)
+    pairs = (games + 1) // 2
+    firsts = []
+    seconds = []
+    openings = []
+    seeds = []
+    for pair in range(pairs):
+        opening = random_opening(opening_plies, seed * 1000003 + pair)
+        for a_first in (True, False):
+            firsts.append(player_a if a_first else player_b)
+            seconds.append(player_b if a_first else player_a)
+            openings.append(opening)
+            seeds.append(seed * 1000003 + len(seeds))
+
+    wins = draws = losses = 0
+    a_time = b_time = 0.0
+    a_moves = b_moves = 0
+    points = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(firsts) // (4 * (workers or os.cpu_count() or 1)))
+        results = executor.map(play_game, firsts, seconds, openings, seeds, repeat(use_book), repeat(endgame_cells),
+                               chunksize=chunksize)
+        for index, (winner, moves, times, counts, record) in enumerate(results):
+            if record_path is not None:
+                append_record(record, record_path)
+            a_piece = 1 if index % 2 == 0 else 2
+            if winner == 0:
+                draws += 1
+                points.append(0.5)
+            elif winner == a_piece:
+                wins += 1
+                points.append(1.0)
+            else:
+                losses += 1
+                points.append(0.0)
+            a_time += times[a_piece - 1]
+            b_time += times[2 - a_piece]
+            a_moves += counts[a_piece - 1]
+            b_moves += counts[2 - a_piece]
+    elapsed = time.perf_counter() - start
+
+    total = len(points)
+    score = sum(points) / total
+    deviation = math.sqrt(sum((point - score) ** 2 for point in points) / total)
+    margin = 1.96 * deviation / math.sqrt(total)
+    elo = elo_difference(score)
+    if math.isfinite(elo):
+        elo_margin = (elo_difference(min(score + margin, 1)) - elo_difference(max(score - margin, 0))) / 2
+    else:
+        elo_margin = float('inf')
+
+    report = {
+        "games": total,
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "score": score,
+        "elo": elo,
+        "elo_margin": elo_margin,
+        "games_per_sec": total / elapsed,
+        "latency_a_ms": a_time / max(a_moves, 1) * 1000,
+        "latency_b_ms": b_time / max(b_moves, 1) * 1000,
+    }
+    print("%s vs %s: %d games, +%d =%d -%d, score %.1f%%"
+          % (player_a, player_b, total, wins, draws, losses, score * 100))
+    print("elo %+.0f +/- %.0f (95%%)" % (elo, elo_margin))
+    print("%.2f games/sec, move latency %s %.2f ms, %s %.2f ms"
+          % (report["games_per_sec"], player_a, report["latency_a_ms"], player_b, report["latency_b_ms"]))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play games between two AI configurations.")
+    parser.add_argument("player_a", help="configuration of player A, e.g. hard:6 or hard:200ms")
+    parser.add_argument("player_b", help="configuration of player B, e.g. medium")
+    parser.add_argument("--games", type=int, default=1000, help="number of games (default 1000)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPUs)")
+    parser.add_argument("--opening-plies", type=int, default=2,
+                        help="random moves at the start of every game (default 2)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the openings (default 0)")
+    parser.add_argument("--record", metavar="PATH", help="append every game to this game log")
+    parser.add_argument("--book", action="store_true", help="let the hard and perfect levels use the opening book")
+    parser.add_argument("--endgame-cells", type=int, default=0,
+                        help="hard level solves exactly from this many empty cells on (default 0: off)")
+    args = parser.parse_args()
+    try:
+        parse_player(args.player_a)
+        parse_player(args.player_b)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    if args.opening_plies < 0:
+        parser.error("--opening-plies must not be negative")
+    if args.endgame_cells < 0:
+        parser.error("--endgame-cells must not be negative")
+    run_arena(args.player_a, args.player_b, args.games, args.workers, args.opening_plies, args.seed, args.record,
+              args.book, args.endgame_cells)
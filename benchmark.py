@@ -0,0 +1,398 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from board import *
+from AIOpponent import *
+from transposition import TranspositionTable
+
+'''
+File: benchmark.py. Benchmarks of the hot paths of Board and AIOpponent on the fixed positions
+                    of benchmark_positions.txt (opening, midgame and endgame). Every benchmark
+                    is timed over all positions of a category, the best of a few repeats is
+                    kept and reported as operations per second (searches per second and nodes
+                    per second for hard).
+
+                    The results are written as JSON. Given a baseline file written by an
+                    earlier run (--save-baseline), every benchmark that got slower than the
+                    baseline by more than the tolerance is reported and the run fails.
+                    Baselines only compare well on the same machine; on a noisy machine use
+                    more repeats or a larger tolerance.
+
+                    With --scaling, hard is timed instead at a fixed depth on random midgame
+                    positions of other board sizes and line lengths (SCALING_SIZES), to see
+                    how the search scales with the board.
+'''
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POSITIONS_FILE = os.path.join(BASE_DIR, "benchmark_positions.txt")
+BASELINE_FILE = os.path.join(BASE_DIR, "benchmark_baseline.json")
+CATEGORIES = ("opening", "midgame", "endgame")
+# (rows, columns, connect) of the scaling benchmark
+SCALING_SIZES = ((6, 7, 4), (7, 8, 4), (9, 7, 4), (10, 8, 4), (6, 7, 5), (10, 8, 5))
+
+
+'''
+CountingBoard Class: Board that counts the moves played on it. Used once per search, outside
+                     of the timed runs, to find the number of nodes the search visits.
+'''
+
+
+class CountingBoard(Board):
+
+    '''
+    Method: CountingBoard constructor.
+    Parameters: same as Board.
+    Return: none
+    '''
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.nodes = 0
+
+    '''
+    Method: play. Board.play that also counts the move.
+    Parameters: same as Board.play.
+    Return: same as Board.play.
+    '''
+
+    def play(self, col, piece):
+        self.nodes += 1
+        return super().play(col, piece)
+
+
+'''
+Function: load_positions. Reads the benchmark positions.
+Parameters:
+    path: positions file. Default is benchmark_positions.txt.
+    board_class: class of the boards to build. Default is Board.
+Return:
+    positions: dictionary from category to a list of (board, piece to move) pairs.
+'''
+
+
+def load_positions(path=POSITIONS_FILE, board_class=Board):
+    positions = {category: [] for category in CATEGORIES}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            category, moves = line.split()
+            board = board_class()
+            piece = 1
+            for char in moves:
+                board.play(int(char) - 1, piece)
+                piece = 3 - piece
+            positions[category].append((board, piece))
+    return positions
+
+
+'''
+Function: time_best. Runs a benchmark a few times and keeps the fastest run.
+Parameters:
+    run: function without parameters that runs the benchmark once.
+    repeat: number of runs.
+Return:
+    seconds: time of the fastest run.
+'''
+
+
+def time_best(run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+'''
+Function: board_benchmarks. Benchmarks of one category. Each benchmark is a function that
+          runs its operation number times on every position and returns the number of
+          operations it ran.
+Parameters:
+    positions: list of (board, piece to move) pairs.
+    number: number of times every operation is run per position.
+Return:
+    benchmarks: dictionary from benchmark name to function.
+'''
+
+
+def board_benchmarks(positions, number):
+
+    def play_undo():
+        count = 0
+        for board, piece in positions:
+            cols = board.empty_col()
+            for _ in range(number):
+                for col in cols:
+                    board.play(col, piece)
+                    board.undo()
+            count += number * len(cols)
+        return count
+
+    def open_row():
+        for board, piece in positions:
+            for _ in range(number):
+                for col in range(board.get_col_board()):
+                    board.open_row(col)
+        return number * len(positions) * positions[0][0].get_col_board()
+
+    def winning_move():
+        for board, piece in positions:
+            for _ in range(number):
+                board.winning_move(1)
+                board.winning_move(2)
+        return number * len(positions) * 2
+
+    def terminal_node():
+        for board, piece in positions:
+            for _ in range(number):
+                board.terminal_node()
+        return number * len(positions)
+
+    def copy():
+        for board, piece in positions:
+            for _ in range(number):
+                copy_board(board)
+        return number * len(positions)
+
+    def score():
+        for board, piece in positions:
+            for _ in range(number):
+                scoring(board, 2)
+        return number * len(positions)
+
+    return {
+        "play_undo": play_undo,
+        "open_row": open_row,
+        "winning_move": winning_move,
+        "terminal_node": terminal_node,
+        "copy_board": copy,
+        "scoring": score,
+    }
+
+
+'''
+Function: run_benchmarks. Runs all benchmarks on all categories.
+Parameters:
+    max_depth: hard is timed at depths 1 to max_depth.
+    number: number of times every board operation is run per position.
+    repeat: number of runs of every benchmark (the fastest one counts).
+    path: positions file.
+Return:
+    results: dictionary from "benchmark/category" to a dictionary with ops_per_sec, and
+             nodes and nodes_per_sec for hard.
+'''
+
+
+def run_benchmarks(max_depth=5, number=200, repeat=5, path=POSITIONS_FILE):
+    results = {}
+    positions = load_positions(path)
+    counting = load_positions(path, CountingBoard)
+    # only the moves of the searches count, not the moves that built the positions
+    for category in CATEGORIES:
+        for board, piece in counting[category]:
+            board.nodes = 0
+    for category in CATEGORIES:
+        for name, run in board_benchmarks(positions[category], number).items():
+            ops = run()
+            seconds = time_best(run, repeat)
+            results["%s/%s" % (name, category)] = {"ops_per_sec": ops / seconds}
+
+        for depth in range(1, max_depth + 1):
+            def search():
+                for board, piece in positions[category]:
+                    hard(board, depth, piece == 2, TranspositionTable(1 << 16))
+
+            nodes = 0
+            for board, piece in counting[category]:
+                hard(board, depth, piece == 2, TranspositionTable(1 << 16))
+                nodes += board.nodes
+                board.nodes = 0
+            if depth == 1:
+                # a search of depth 1 plays every open root column once
+                columns = sum(len(board.empty_col()) for board, piece in counting[category])
+                if nodes != columns:
+                    raise AssertionError("hard_1/%s counted %d nodes for %d open columns" % (category, nodes, columns))
+            seconds = time_best(search, repeat)
+            results["hard_%d/%s" % (depth, category)] = {
+                "ops_per_sec": len(positions[category]) / seconds,
+                "nodes": nodes,
+                "nodes_per_sec": nodes / seconds,
+            }
+    return results
+
+
+'''
+Function: random_positions. Random midgame positions of one board size: games of random
+          moves stopped after a random number of moves, skipping positions that are over or
+          where the side to move wins at once.
+Parameters:
+    size: (rows, columns, connect) of the board.
+    count: number of positions.
+    seed: seed of the random moves.
+    board_class: class of the boards to build. Default is Board.
+Return:
+    positions: list of (board, piece to move) pairs.
+'''
+
+
+def random_positions(size, count, seed, board_class=Board):
+    rng = random.Random(seed)
+    positions = []
+    row_board, col_board, connect = size
+    while len(positions) < count:
+        board = board_class(row_board, col_board, connect)
+        piece = 1
+        for move in range(rng.randint(col_board, row_board * col_board // 2)):
+            board.play(rng.choice(board.empty_col()), piece)
+            piece = 3 - piece
+            if board.terminal_node():
+                break
+        if not board.terminal_node() and not board.winning_cells(piece) & board.playable_cells():
+            positions.append((board, piece))
+    return positions
+
+
+'''
+Function: run_scaling. Times hard at a fixed depth on random midgame positions of every board
+          size of SCALING_SIZES.
+Parameters:
+    depth: depth of tree exploration.
+    count: number of positions per board size.
+    repeat: number of runs (the fastest one counts).
+    seed: seed of the positions.
+Return:
+    results: dictionary from "hard_DEPTH/ROWSxCOLSc CONNECT" to a dictionary with ops_per_sec,
+             nodes and nodes_per_sec.
+'''
+
+
+def run_scaling(depth=4, count=6, repeat=3, seed=0):
+    results = {}
+    for size in SCALING_SIZES:
+        positions = random_positions(size, count, seed)
+        counting = random_positions(size, count, seed, CountingBoard)
+        for board, piece in counting:
+            board.nodes = 0
+
+        def search():
+            for board, piece in positions:
+                hard(board, depth, piece == 2, TranspositionTable(1 << 16))
+
+        nodes = 0
+        for board, piece in counting:
+            hard(board, depth, piece == 2, TranspositionTable(1 << 16))
+            nodes += board.nodes
+        seconds = time_best(search, repeat)
+        results["hard_%d/%dx%dc%d" % ((depth,) + size)] = {
+            "ops_per_sec": len(positions) / seconds,
+            "nodes": nodes,
+            "nodes_per_sec": nodes / seconds,
+        }
+    return results
+
+
+'''
+Function: compare. Compares results with a baseline.
+Parameters:
+    results: results of run_benchmarks.
+    baseline: results of an earlier run.
+    tolerance: fraction of slowdown accepted before a benchmark counts as a regression.
+Return:
+    regressions: list of (name, baseline ops/sec, current ops/sec) of the benchmarks that
+                 got slower than the tolerance allows.
+'''
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["ops_per_sec"]
+        after = result["ops_per_sec"]
+        if after < before * (1 - tolerance):
+            regressions.append((name, before, after))
+    return regressions
+
+
+'''
+Function: print_results. Prints the results as a table, with the change from the baseline.
+Parameters:
+    results: results of run_benchmarks.
+    baseline: results of an earlier run (optional).
+Return: none
+'''
+
+
+def print_results(results, baseline=None):
+    for name, result in results.items():
+        line = "%-24s %14.0f ops/s" % (name, result["ops_per_sec"])
+        if "nodes_per_sec" in result:
+            line += " %14.0f nodes/s (%d nodes)" % (result["nodes_per_sec"], result["nodes"])
+        if baseline and name in baseline:
+            line += " %+7.1f%%" % ((result["ops_per_sec"] / baseline[name]["ops_per_sec"] - 1) * 100)
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Board and AIOpponent on fixed positions.")
+    parser.add_argument("--max-depth", type=int, default=5, help="hard is timed at depths 1 to N (default 5)")
+    parser.add_argument("--number", type=int, default=200,
+                        help="runs of every board operation per position (default 200)")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats per benchmark, the fastest counts (default 5)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE_FILE,
+                        help="baseline to compare with (default benchmark_baseline.json, skipped if missing)")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="slowdown accepted before a benchmark fails (default 0.25 = 25%%)")
+    parser.add_argument("--scaling", action="store_true",
+                        help="time hard at depth --max-depth on other board sizes instead "
+                             "(no baseline is used)")
+    args = parser.parse_args()
+    if args.max_depth < 1 or args.number < 1 or args.repeat < 1:
+        parser.error("--max-depth, --number and --repeat must be at least 1")
+
+    if args.scaling:
+        results = run_scaling(args.max_depth, repeat=args.repeat)
+        print_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                           "results": results}, f, indent=2, sort_keys=True)
+        sys.exit(0)
+
+    results = run_benchmarks(args.max_depth, args.number, args.repeat)
+    document = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+        print("saved baseline to %s" % args.baseline)
+    elif baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print("REGRESSION %s: %.0f -> %.0f ops/s (%.1f%%)" % (name, before, after, (after / before - 1) * 100))
+        if regressions:
+            sys.exit(1)
+        print("no regressions against %s" % args.baseline)
@@ -1,4 +1,6 @@
 import numpy as np
+import random
+from functools import lru_cache
 
 '''
 Board Class: Used to create connect 4 board object. This class contains methods
@@ -16,16 +18,50 @@ class Board:
     Parameters: 
         row_board: number of rows for connect 4 board. Default is a row of size 6.
         col_board: number of columns for connect 4 board. Default is a row of size 7.
+        connect: number of pieces in a row needed to win. Default is 4.
     Return: none
+    Raises:
+        ValueError: if connect is below 3 or does not fit on the board.
     '''
 
-    def __init__(self, row_board=6, col_board=7):
+    def __init__(self, row_board=6, col_board=7, connect=4):
+        if connect < 3 or connect > max(row_board, col_board):
+            raise ValueError("cannot play connect %d on a %dx%d board" % (connect, row_board, col_board))
         self.row_board = row_board
         self.col_board = col_board
+        self.connect = connect
         self.board = [[0 for i in range(col_board)] for j in range(row_board)]
         self.player_piece = 1
         self.AI_piece = 2
 
+        # bitboard state: each column takes row_board bits plus one empty
+        # sentinel bit on top, so shifted lines never wrap into the next column.
+        self.stride = row_board + 1
+        self.pieces = [0, 0, 0]
+        self.mask = 0
+        self.heights = [0 for i in range(col_board)]
+        self.bottom = sum(1 << (col * self.stride) for col in range(col_board))
+        self.full = (self.bottom << row_board) - self.bottom
+        self.lines = line_masks(row_board, col_board, connect)
+        self.zobrist = zobrist_keys(row_board, col_board)
+        self.zobrist_hash = 0
+        self.moves = []
+
+        # cached result of the game: winner is 0 while nobody has connect in a row,
+        # win_bit is the cell that completed the winning line.
+        self.winner = 0
+        self.win_bit = 0
+
+        # incremental evaluation: number of pieces of each player in every window
+        # of connect cells, and the running score of each player (same as
+        # AIOpponent.scoring).
+        self.windows = cell_windows(row_board, col_board, connect)
+        self.points = window_points(connect).tolist()
+        self.window_counts = [None, [0] * len(window_table(row_board, col_board, connect)),
+                              [0] * len(window_table(row_board, col_board, connect))]
+        self.scores = [0, 0, 0]
+        self.center_cols = center_columns(col_board)
+
     '''
     Method: get_row_board
     Parameters: none
@@ -71,6 +107,109 @@ class Board:
     def get_AI_piece(self):
         return self.AI_piece
 
+    '''
+    Method: get_connect
+    Parameters: none
+    Return: number of pieces in a row needed to win
+    '''
+
+    def get_connect(self):
+        return self.connect
+
+    '''
+    Method: get_key. Compact position key built from the bitboards. Adding the
+            bottom row to the occupancy mask leaves a single marker bit on top of
+            every column, and the player 1 bits underneath it are enough to tell
+            the two pieces apart, so the key is unique for every position.
+    Parameters: none
+    Return: 
+        key: hashable integer that identifies the position.
+    '''
+
+    def get_key(self):
+        return self.pieces[1] + self.mask + self.bottom
+
+    '''
+    Method: cell_bit. Bit that represents a position in the bitboards.
+    Parameters:
+        row: row of the board.
+        col: column of the board.
+    Return: 
+        bit: integer with only the bit of the position set.
+    '''
+
+    def cell_bit(self, row, col):
+        return 1 << (col * self.stride + row)
+
+    '''
+    Method: get_winner. Getter for the cached result of the game.
+    Parameters: none
+    Return: 
+        winner: piece that has connect pieces in a row, or 0 if there is no winner yet.
+    '''
+
+    def get_winner(self):
+        return self.winner
+
+    '''
+    Method: get_hash. Getter for the Zobrist hash of the position. The hash is kept up
+            to date incrementally by drop_piece and undo.
+    Parameters: none
+    Return: 
+        zobrist_hash: 64-bit hash of the position.
+    '''
+
+    def get_hash(self):
+        return self.zobrist_hash
+
+    '''
+    Method: get_score. Getter for the running evaluation of the position. The score is
+            updated by drop_piece and undo from the windows through the changed cell
+            only and is always equal to AIOpponent.scoring(board, piece).
+    Parameters:
+        piece: numerical representation of the player or AI piece.
+    Return: 
+        score: points of the position for the piece.
+    '''
+
+    def get_score(self, piece):
+        return self.scores[piece]
+
+    '''
+    Method: update_scores. Adds or removes a piece in the window counts and updates the
+            running scores of both players. Only the windows through the cell change.
+    Parameters:
+        index: bit position of the cell.
+        col: column of the cell.
+        piece: numerical representation of the player or AI piece.
+        step: 1 when the piece is dropped, -1 when it is taken back.
+    Return: none
+    '''
+
+    def update_scores(self, index, col, piece, step):
+        points = self.points
+        counts_1 = self.window_counts[1]
+        counts_2 = self.window_counts[2]
+        score_1 = self.scores[1]
+        score_2 = self.scores[2]
+        for window in self.windows[index]:
+            count_1 = counts_1[window]
+            count_2 = counts_2[window]
+            score_1 -= points[count_1][count_2]
+            score_2 -= points[count_2][count_1]
+            if piece == 1:
+                count_1 += step
+                counts_1[window] = count_1
+            else:
+                count_2 += step
+                counts_2[window] = count_2
+            score_1 += points[count_1][count_2]
+            score_2 += points[count_2][count_1]
+        self.scores[1] = score_1
+        self.scores[2] = score_2
+        if col in self.center_cols:
+            self.scores[piece] += 3 * step
+
     '''
     Method: print_board. Prints the 2D matrix array board in the 
             correct orientation. 2D matrix needs to be flipped
@@ -86,13 +225,69 @@ class Board:
 
     '''
     Method: drop_piece. Drops the player (1) or AI (2) numerical representation
-            into the 2D matrix of the board.
+            into the 2D matrix of the board and updates the cached winner and the
+            running scores.
     Parameters: none
     Return: none
     '''
 
     def drop_piece(self, row, col, piece):
+        index = col * self.stride + row
+        bit = 1 << index
         self.board[row][col] = piece
+        self.pieces[piece] |= bit
+        self.mask |= bit
+        self.zobrist_hash ^= self.zobrist[piece][index]
+        if self.heights[col] <= row:
+            self.heights[col] = row + 1
+        self.update_scores(index, col, piece, 1)
+
+        # a new line has to go through the cell that was just filled, so only
+        # the four lines through that cell are checked.
+        if not self.winner and self.connected(self.pieces[piece] & self.lines[index]):
+            self.winner = piece
+            self.win_bit = bit
+
+    '''
+    Method: play. Drops a piece into a column in place and remembers the column
+            on the move stack so that the move can be taken back with undo. Used
+            by the search instead of copying the board for every child.
+    Parameters:
+        col: column of the board (must not be full).
+        piece: numerical representation of the player or AI piece.
+    Return: 
+        row: row where the piece landed.
+    '''
+
+    def play(self, col, piece):
+        row = self.heights[col]
+        self.drop_piece(row, col, piece)
+        self.moves.append(col)
+        return row
+
+    '''
+    Method: undo. Takes back the last move made with play.
+    Parameters: none
+    Return: 
+        col: column of the move that was taken back.
+    '''
+
+    def undo(self):
+        col = self.moves.pop()
+        row = self.heights[col] - 1
+        index = col * self.stride + row
+        bit = 1 << index
+        piece = self.board[row][col]
+        self.pieces[piece] ^= bit
+        self.mask ^= bit
+        self.zobrist_hash ^= self.zobrist[piece][index]
+        self.heights[col] = row
+        self.board[row][col] = 0
+        self.update_scores(index, col, piece, -1)
+        if bit == self.win_bit:
+            self.winner = 0
+            self.win_bit = 0
+        return col
 
     '''
     Method: open_row. Returns the empty row position for a specific
@@ -104,9 +299,8 @@ class Board:
     '''
 
     def open_row(self, col):
-        for row in range(self.row_board):
-            if self.board[row][col] == 0:
-                return row
+        if self.heights[col] < self.row_board:
+            return self.heights[col]
 
     '''
     Method: valid_move. Checks if a column still contains empty empty rows.
@@ -118,10 +312,7 @@ class Board:
     '''
 
     def valid_move(self, col):
-        if (self.board[self.row_board - 1][col] == 0):
-            return True
-        else:
-            return False
+        return self.heights[col] < self.row_board
 
     '''
     Method: empty_col. Appends all columns that are not completely fill
@@ -132,47 +323,44 @@ class Board:
     '''
 
     def empty_col(self):
-        empty_col = []
-        for column in range(self.col_board):
-            if self.valid_move(column) == True:
-                empty_col.append(column)
-        return empty_col
+        heights = self.heights
+        row_board = self.row_board
+        return [column for column in range(self.col_board) if heights[column] < row_board]
 
     '''
     Method: horiztonal_win. Only need to check a certain number of columns
-            to identify a horizontal victory. Example: checking row 3, we 
-            only need to check from col 0 to 3, col 1 to 4, col 2 to 5 and
-            col 3 to 6.
+            to identify a horizontal victory. Example: checking row 3 of a
+            connect 4 board, we only need to check from col 0 to 3, col 1 to 4,
+            col 2 to 5 and col 3 to 6.
     Parameters:
         piece: numerical representation of the player or AI piece.
     Return:
-        True: if a horizontal win (4 pieces horizontally) exists on the board.
+        True: if a horizontal win (connect pieces horizontally) exists on the board.
         None: if a horizontal win does not exist.
     '''
 
     def horizontal_win(self, piece):
-        for col in range(self.col_board - 3):
+        for col in range(self.col_board - self.connect + 1):
             for row in range(self.row_board):
-                if self.board[row][col] == piece and self.board[row][col + 1] == piece and self.board[row][col + 2] == piece and self.board[row][
-                        col + 3] == piece:
+                if all(self.board[row][col + i] == piece for i in range(self.connect)):
                     return True
 
     '''
     Method: vertical_win. Only need to check a certain number of rows
-            to identify a horizontal victory. Example: checking col 3, we 
-            only need to check from row 0 to 3, row 1 to 4, and row 2 to 5. 
+            to identify a horizontal victory. Example: checking col 3 of a
+            connect 4 board, we only need to check from row 0 to 3, row 1 to 4,
+            and row 2 to 5.
     Parameters:
         piece: numerical representation of the player or AI piece.
     Return:
-        True: if a vertical win (4 pieces vertically) exists on the board.
+        True: if a vertical win (connect pieces vertically) exists on the board.
         None: if a vertical win does not exist.
     '''
 
     def vertical_win(self, piece):
         for col in range(self.col_board):
-            for row in range(self.row_board - 3):
-                if self.board[row][col] == piece and self.board[row + 1][col] == piece and self.board[row + 2][col] == piece and self.board[row + 3][
-                        col] == piece:
+            for row in range(self.row_board - self.connect + 1):
+                if all(self.board[row + i][col] == piece for i in range(self.connect)):
                     return True
 
     '''
@@ -180,26 +368,77 @@ class Board:
     Parameters:
         piece: numerical representation of the player or AI piece.
     Return:
-        True: if a diagonal win (4 pieces diagonally) exists on the board.
+        True: if a diagonal win (connect pieces diagonally) exists on the board.
         None: if a diagonal win does not exist.
     '''
 
     def diagonal_win(self, piece):
-        for col in range(self.col_board - 3):
-            for row in range(self.row_board - 3):
-                if self.board[row][col] == piece and self.board[row + 1][col + 1] == piece and self.board[row + 2][col + 2] == piece and self.board[row + 3][
-                        col + 3] == piece:
+        last = self.connect - 1
+        for col in range(self.col_board - last):
+            for row in range(self.row_board - last):
+                if all(self.board[row + i][col + i] == piece for i in range(self.connect)):
                     return True
 
-        for col in range(self.col_board - 3):
-            for row in range(3, self.row_board):
-                if self.board[row][col] == piece and self.board[row - 1][col + 1] == piece and self.board[row - 2][col + 2] == piece and self.board[row - 3][
-                        col + 3] == piece:
+        for col in range(self.col_board - last):
+            for row in range(last, self.row_board):
+                if all(self.board[row - i][col + i] == piece for i in range(self.connect)):
                     return True
 
+    '''
+    Method: connected. Checks a bitboard for connect pieces in a row. For every direction
+            (vertical, horizontal and both diagonals) the bitboard is shifted by the
+            distance between two neighbouring cells; a bit that survives the two
+            shift-and-AND steps is the start of a line of four. The sentinel bit on
+            top of each column keeps lines from wrapping around the board. Connect 4
+            is unrolled; other lengths double the run length with every step (see
+            line_starts).
+    Parameters:
+        bits: bitboard of a single piece.
+    Return:
+        True: if the bitboard contains connect pieces in a row.
+        False: if it does not.
+    '''
+
+    def connected(self, bits):
+        if self.connect != 4:
+            for shift in (1, self.stride, self.stride - 1, self.stride + 1):
+                if line_starts(bits, shift, self.connect):
+                    return True
+            return False
+        for shift in (1, self.stride, self.stride - 1, self.stride + 1):
+            pairs = bits & (bits >> shift)
+            if pairs & (pairs >> (2 * shift)):
+                return True
+        return False
+
+    '''
+    Method: winning_cells. Finds every empty cell that would complete a line of connect
+            pieces (see open_threats). Used by the search to try winning and blocking moves
+            first.
+    Parameters:
+        piece: numerical representation of the player or AI piece.
+    Return:
+        cells: bitboard of the empty cells that would give the piece a win.
+    '''
+
+    def winning_cells(self, piece):
+        return open_threats(self.pieces[piece], self.full ^ self.mask, self.stride, self.connect)
+
+    '''
+    Method: playable_cells. Bitboard of the cells where the next piece of every column
+            that is not full would land.
+    Parameters: none
+    Return:
+        cells: bitboard with one bit per open column.
+    '''
+
+    def playable_cells(self):
+        return (self.mask + self.bottom) & self.full
+
     '''
     Method: winning_move. The board is checked to see if a horizontal, vertical or diagonal win
-            exists for a certain piece. 
+            exists for a certain piece. Reads the winner cached by drop_piece, which gives the
+            same answer as horizontal_win, vertical_win and diagonal_win combined.
     Parameters:
         piece: numerical representation of the player or AI piece.
     Return:
@@ -208,7 +447,7 @@ class Board:
     '''
 
     def winning_move(self, piece):
-        return self.horizontal_win(piece) or self.vertical_win(piece) or self.diagonal_win(piece)
+        return self.winner == piece
 
     '''
     Method: terminal_node. 
@@ -220,12 +459,12 @@ class Board:
     '''
 
     def terminal_node(self):
-        return len(self.empty_col()) == 0 or self.winning_move(1) or self.winning_move(2)
+        return self.winner != 0 or self.mask == self.full
 
 
 '''
 Function: copy_board. Creates a new instance of the board object where the
-          board matrix is the same as the board that needs to be copied.
+          board matrix and bitboards are the same as the board that needs to be copied.
 Parameters:
     board: 2D matrix of the board that needs to be copied.
 Return:
@@ -234,11 +473,265 @@ Return:
 
 
 def copy_board(board):
-    new_board = Board(board.get_row_board(), board.get_col_board())
-
-    for row in range(board.get_row_board()):
-        for col in range(board.get_col_board()):
-            (new_board.get_board())[row][col] = (
-                board.get_board())[row][col]
+    new_board = Board(board.get_row_board(), board.get_col_board(), board.get_connect())
+
+    new_board.board = [row[:] for row in board.get_board()]
+    new_board.pieces = board.pieces[:]
+    new_board.mask = board.mask
+    new_board.heights = board.heights[:]
+    new_board.moves = board.moves[:]
+    new_board.winner = board.winner
+    new_board.win_bit = board.win_bit
+    new_board.zobrist_hash = board.zobrist_hash
+    new_board.window_counts = [None, board.window_counts[1][:], board.window_counts[2][:]]
+    new_board.scores = board.scores[:]
 
     return new_board
+
+
+'''
+Function: line_starts. Cells where a line of connect pieces starts in one direction of a
+          bitboard. Each step ANDs the bitboard with itself shifted by the current run
+          length, so the run length doubles and connect pieces take about log2(connect)
+          steps instead of connect - 1.
+Parameters:
+    bits: bitboard of a single piece.
+    shift: distance between two neighbouring cells of the direction.
+    connect: length of the line.
+Return:
+    starts: bitboard of the first cell of every line of connect pieces.
+'''
+
+
+def line_starts(bits, shift, connect):
+    length = 1
+    while length * 2 <= connect:
+        bits &= bits >> (length * shift)
+        length *= 2
+    if length < connect:
+        bits &= bits >> ((connect - length) * shift)
+    return bits
+
+
+'''
+Function: threat_cells. Cells (empty or not) that would complete a line of connect pieces of
+          a bitboard: for every direction and every position of the cell in the line, the
+          other connect - 1 cells of the line must hold a piece. Used by open_threats for other
+          lengths than four, which has unrolled shifts for four.
+Parameters:
+    bits: bitboard of a single piece.
+    stride: bits per column of the bitboard (rows + 1).
+    connect: length of the line.
+Return:
+    cells: bitboard of the cells that would complete a line.
+'''
+
+
+def threat_cells(bits, stride, connect):
+    cells = 0
+    for shift in (1, stride, stride - 1, stride + 1):
+        for gap in range(connect):
+            line = -1
+            for offset in range(connect):
+                if offset == gap:
+                    continue
+                distance = (gap - offset) * shift
+                if distance > 0:
+                    line &= bits << distance
+                else:
+                    line &= bits >> -distance
+            cells |= line
+    return cells
+
+
+'''
+Function: open_threats. Empty cells that would complete a line of connect pieces of a
+          bitboard. Lines of four use unrolled shifts of the bitboard (three pieces and the
+          cell, for every position of the cell in the line); other lengths use threat_cells.
+          Shared by Board.winning_cells and the solver.
+Parameters:
+    bits: bitboard of a single piece.
+    empty: bitboard of the empty cells.
+    stride: bits per column of the bitboard (rows + 1).
+    connect: length of the line.
+Return:
+    cells: bitboard of the empty cells that would give the piece a win.
+'''
+
+
+def open_threats(bits, empty, stride, connect):
+    if connect != 4:
+        return threat_cells(bits, stride, connect) & empty
+    cells = (bits << 1) & (bits << 2) & (bits << 3)
+    for shift in (stride, stride - 1, stride + 1):
+        pairs = (bits << shift) & (bits << 2 * shift)
+        cells |= pairs & (bits << 3 * shift)
+        cells |= pairs & (bits >> shift)
+        pairs = (bits >> shift) & (bits >> 2 * shift)
+        cells |= pairs & (bits << shift)
+        cells |= pairs & (bits >> 3 * shift)
+    return cells & empty
+
+
+'''
+Function: center_columns. Center column of the board, or the two middle columns if the
+          number of columns is even. Pieces there get a bonus in the scoring.
+Parameters:
+    col_board: number of columns of the board.
+Return:
+    columns: tuple of the center columns.
+'''
+
+
+@lru_cache(maxsize=None)
+def center_columns(col_board):
+    if col_board % 2:
+        return (col_board // 2,)
+    return (col_board // 2 - 1, col_board // 2)
+
+
+'''
+Function: center_order. Column order used by the search and the solver: the center column
+          (or the two middle columns) first, then the columns next to it, moving outwards
+          (left before right).
+Parameters:
+    col_board: number of columns of the board.
+Return:
+    order: tuple of the columns sorted from the center outwards.
+'''
+
+
+@lru_cache(maxsize=None)
+def center_order(col_board):
+    return tuple(sorted(range(col_board), key=lambda col: (abs(2 * col - col_board + 1), col)))
+
+
+'''
+Function: line_masks. Builds, for every cell of the bitboard, the mask of all cells that
+          lie on a horizontal, vertical or diagonal line of connect cells through that cell.
+          The masks only depend on the board size, so they are computed once and shared by
+          all boards of that size.
+Parameters:
+    row_board: number of rows of the board.
+    col_board: number of columns of the board.
+    connect: length of a winning line. Default is 4.
+Return:
+    lines: list indexed by bit position (col * (row_board + 1) + row) of line masks.
+'''
+
+
+@lru_cache(maxsize=None)
+def line_masks(row_board, col_board, connect=4):
+    stride = row_board + 1
+    lines = [0] * (stride * col_board)
+    for col in range(col_board):
+        for row in range(row_board):
+            mask = 0
+            for d_row, d_col in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                for step in range(1 - connect, connect):
+                    r = row + step * d_row
+                    c = col + step * d_col
+                    if 0 <= r < row_board and 0 <= c < col_board:
+                        mask |= 1 << (c * stride + r)
+            lines[col * stride + row] = mask
+    return tuple(lines)
+
+
+'''
+Function: zobrist_keys. Random 64-bit keys for every (piece, cell) pair. The Zobrist hash
+          of a position is the XOR of the keys of all occupied cells, so dropping or
+          removing a piece updates it with a single XOR. A fixed seed keeps the hashes
+          identical between runs and processes.
+Parameters:
+    row_board: number of rows of the board.
+    col_board: number of columns of the board.
+Return:
+    keys: tuple indexed by piece (0, 1, 2) of tuples indexed by bit position.
+'''
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(row_board, col_board):
+    rng = random.Random(0xC4)
+    cells = (row_board + 1) * col_board
+    return tuple(tuple(rng.getrandbits(64) for i in range(cells)) for piece in range(3))
+
+
+'''
+Function: window_table. Precomputes every window of connect cells (horizontal, vertical and
+          both diagonals) that could hold a winning line. A 6x7 board has 69 windows of four.
+          Cells are numbered row * col_board + col, which is their position in the flattened
+          2D matrix of the board, so a batch of boards can be scored with one gather.
+Parameters:
+    row_board: number of rows of the board.
+    col_board: number of columns of the board.
+    connect: length of a winning line. Default is 4.
+Return:
+    windows: read-only int array of shape (number of windows, connect) with the cells of
+             each window.
+'''
+
+
+@lru_cache(maxsize=None)
+def window_table(row_board, col_board, connect=4):
+    windows = []
+    for d_row, d_col in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+        for row in range(row_board):
+            for col in range(col_board):
+                end_row = row + (connect - 1) * d_row
+                end_col = col + (connect - 1) * d_col
+                if 0 <= end_row < row_board and end_col < col_board:
+                    windows.append([(row + i * d_row) * col_board + col + i * d_col for i in range(connect)])
+    windows = np.array(windows, dtype=np.intp).reshape(len(windows), connect)
+    windows.setflags(write=False)
+    return windows
+
+
+'''
+Function: window_points. Points of a single window for the scoring of the AI, indexed by the
+          number of the player's pieces and the number of the opponent's pieces in it. For
+          windows of four: 4 pieces +100, 3 pieces and an empty cell +10, 2 pieces and 2 empty
+          cells +5, 3 opponent pieces and an empty cell -90, 2 opponent pieces and 2 empty
+          cells -10; longer windows use the same weights counted from a full window
+          (connect, connect - 1 and connect - 2 pieces). Same weights as player_score_eval
+          and opponent_score_eval in AIOpponent.
+Parameters:
+    connect: length of a window. Default is 4.
+Return:
+    points: read-only int array of shape (connect + 1, connect + 1).
+'''
+
+
+@lru_cache(maxsize=None)
+def window_points(connect=4):
+    points = np.zeros((connect + 1, connect + 1), dtype=np.int64)
+    points[connect][0] = 100
+    points[connect - 1][0] = 10
+    points[connect - 2][0] = 5
+    points[0][connect - 1] = -90
+    points[0][connect - 2] = -10
+    points.setflags(write=False)
+    return points
+
+
+'''
+Function: cell_windows. For every cell of the bitboard, the windows of window_table that
+          contain the cell. Used to update the evaluation incrementally.
+Parameters:
+    row_board: number of rows of the board.
+    col_board: number of columns of the board.
+    connect: length of a window. Default is 4.
+Return:
+    windows: tuple indexed by bit position (col * (row_board + 1) + row) of tuples of
+             window numbers.
+'''
+
+
+@lru_cache(maxsize=None)
+def cell_windows(row_board, col_board, connect=4):
+    stride = row_board + 1
+    windows = [[] for i in range(stride * col_board)]
+    for window, cells in enumerate(window_table(row_board, col_board, connect).tolist()):
+        for cell in cells:
+            windows[(cell % col_board) * stride + cell // col_board].append(window)
+    return tuple(tuple(window) for window in windows)
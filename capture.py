@@ -0,0 +1,120 @@
+import collections
+import threading
+import time
+
+'''
+File: capture.py. Camera capture on its own thread. The capture thread reads frames as fast as
+                  the camera delivers them into a small bounded buffer; the game loop always
+                  takes the newest frame and the older ones are dropped. A slow frame in the
+                  game loop therefore never leaves it working through a backlog of stale frames.
+'''
+
+
+'''
+FrameGrabber Class: Latest-frame-wins capture stage. Counts the frames captured from the
+                    camera, handed to the game loop (processed) and skipped (dropped).
+'''
+
+
+class FrameGrabber:
+
+    '''
+    Method: FrameGrabber constructor.
+    Parameters:
+        capture: opened video source with a read() method, e.g. cv2.VideoCapture(0).
+        buffer_size: number of frames kept at most. Default is 2.
+    Return: none
+    '''
+
+    def __init__(self, capture, buffer_size=2):
+        self.capture = capture
+        self.frames = collections.deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.captured = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    '''
+    Method: start. Starts the capture thread.
+    Parameters: none
+    Return: none
+    '''
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="FrameGrabber", daemon=True)
+        self.thread.start()
+
+    '''
+    Method: run. Body of the capture thread: reads frames until stop is called. When the
+            buffer is full the oldest frame falls out and counts as dropped.
+    Parameters: none
+    Return: none
+    '''
+
+    def run(self):
+        while self.running:
+            ok, frame = self.capture.read()
+            if not ok:
+                self.failed += 1
+                time.sleep(0.01)
+                continue
+            with self.condition:
+                if len(self.frames) == self.frames.maxlen:
+                    self.dropped += 1
+                self.frames.append(frame)
+                self.captured += 1
+                self.condition.notify()
+
+    '''
+    Method: read. Takes the newest frame, waiting for one if the buffer is empty. Frames that
+            are older than the newest one are dropped.
+    Parameters:
+        timeout: seconds to wait for a frame (optional, default waits until there is one).
+    Return:
+        frame: newest frame, or None if no frame arrived in time or the grabber was stopped.
+    '''
+
+    def read(self, timeout=None):
+        with self.condition:
+            if not self.frames:
+                self.condition.wait_for(lambda: self.frames or not self.running, timeout)
+            if not self.frames:
+                return None
+            frame = self.frames.pop()
+            self.dropped += len(self.frames)
+            self.frames.clear()
+            self.processed += 1
+            return frame
+
+    '''
+    Method: get_stats. Frame counters of the capture stage.
+    Parameters: none
+    Return:
+        stats: dictionary with the captured, processed, dropped and failed frame counts.
+    '''
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                "captured": self.captured,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+    '''
+    Method: stop. Stops the capture thread and wakes up a waiting read.
+    Parameters: none
+    Return: none
+    '''
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,185 @@
+from board import *
+from AIOpponent import *
+from transposition import TranspositionTable
+from parallel import ParallelSearch
+from opening_book import load_book
+from solver import Solver
+from search_stats import SearchStats
+
+'''
+File: engine.py. Puts the levels of the AI behind one object, so the game loop only asks for
+                 a move. The engine also ponders: while the player thinks, it searches its
+                 answers to the player's likely moves and keeps them for when the player
+                 actually drops a piece.
+'''
+
+# the perfect level solves exactly from this number of empty cells on (well under a second
+# per move on 6x7 games) and plays the book and a timed search before that
+PERFECT_CELLS = 24
+PERFECT_MS = 1000
+
+
+'''
+Engine Class: AI opponent of one game. Holds everything that lives for the whole game (the
+              transposition table, worker processes, opening book and endgame solver).
+              The engine plays the AI piece (2).
+'''
+
+
+class Engine:
+
+    '''
+    Method: Engine constructor.
+    Parameters:
+        level: "easy", "medium", "hard" or "perfect".
+        ply: depth of tree exploration of the hard level. Default is 4.
+        think_ms: time budget per move of the hard level; replaces ply when given (optional).
+                  The perfect level searches with this budget (default PERFECT_MS) until
+                  PERFECT_CELLS cells are empty.
+        workers: number of worker processes of the hard level. Default is 1 (no workers).
+        use_book: use the opening book in the hard and perfect levels if it exists. Default is True.
+        endgame_cells: the hard level solves the game exactly from this number of empty
+                       cells on; 0 turns it off. Default is 16.
+        move_delay: seconds the easy level waits before answering. Default is 0.7.
+        collect_stats: keep the SearchStats of the last search in stats. Default is False.
+        row_board: number of rows of the boards the engine plays on. Default is 6.
+        col_board: number of columns of the boards the engine plays on. Default is 7.
+        connect: number of pieces in a row needed to win. Default is 4.
+    Return: none
+    '''
+
+    def __init__(self, level, ply=4, think_ms=None, workers=1, use_book=True, endgame_cells=16, move_delay=0.7,
+                 collect_stats=False, row_board=6, col_board=7, connect=4):
+        self.level = level
+        self.ply = ply
+        self.think_ms = think_ms
+        self.move_delay = move_delay
+        self.table = TranspositionTable()
+        self.search = None
+        self.book = None
+        self.solver = None
+        self.ponder_moves = {}
+        self.ponder_hits = 0
+        self.stats = None
+        if collect_stats:
+            self.stats = SearchStats()
+        if level == "hard":
+            if workers > 1:
+                self.search = ParallelSearch(workers)
+            if use_book:
+                self.book = load_book()
+            if endgame_cells > 0:
+                self.solver = Solver(row_board, col_board, endgame_cells=endgame_cells, connect=connect)
+        elif level == "perfect":
+            if use_book:
+                self.book = load_book()
+            if think_ms is None:
+                self.think_ms = PERFECT_MS
+            self.solver = Solver(row_board, col_board, endgame_cells=PERFECT_CELLS, connect=connect)
+
+    '''
+    Method: analyse. Searches the move of the given piece with the level of the engine.
+    Parameters:
+        board: board object.
+        piece: numerical representation of the agent to move. Default is 2 (the AI).
+    Return:
+        column: best column.
+        score: score of the column for the AI piece (2), as in hard; None for the easy and
+               medium levels.
+        depth: depth of the search (1 for medium, 0 for easy, the number of empty cells
+               for solved positions). The perfect level solves positions with PERFECT_CELLS
+               empty cells or fewer and searches like the timed hard level before.
+    '''
+
+    def analyse(self, board, piece=2):
+        maximizer = piece == 2
+        stats = self.stats
+        if stats is not None:
+            stats.reset()
+            if self.level in ("easy", "medium"):
+                stats.source = self.level
+            elif self.search is not None:
+                stats.source = "parallel"
+        if self.level == "easy":
+            return easy(board, self.move_delay), None, 0
+        if self.level == "medium":
+            return medium(board, piece), None, 1
+        if self.think_ms is not None:
+            if self.search is not None:
+                return self.search.search_timed(board, self.think_ms, maximizer, book=self.book, solver=self.solver,
+                                                stats=stats)
+            return hard_timed(board, self.think_ms, maximizer, self.table, book=self.book, solver=self.solver,
+                              stats=stats)
+        if self.search is not None:
+            column, score = self.search.search(board, self.ply, maximizer, book=self.book, solver=self.solver,
+                                               stats=stats)
+        else:
+            column, score = hard(board, self.ply, maximizer, self.table, book=self.book, solver=self.solver,
+                                 stats=stats)
+        return column, score, self.ply
+
+    '''
+    Method: search_move. Searches the AI move of a board state with the level of the engine.
+    Parameters:
+        board: board object with the AI to move.
+    Return:
+        column: column chosen by the AI.
+    '''
+
+    def search_move(self, board):
+        return self.analyse(board)[0]
+
+    '''
+    Method: choose_move. Move of the AI. Uses the answer found while pondering if the player
+            played one of the moves the engine pondered on, otherwise searches.
+    Parameters:
+        board: board object with the AI to move.
+    Return:
+        column: column chosen by the AI.
+    '''
+
+    def choose_move(self, board):
+        column = self.ponder_moves.get(board.get_key())
+        self.ponder_moves = {}
+        if column is not None and board.valid_move(column):
+            self.ponder_hits += 1
+            if self.stats is not None:
+                self.stats.reset()
+                self.stats.source = "ponder"
+            return column
+        return self.search_move(board)
+
+    '''
+    Method: ponder. Searches the AI answers to the moves the player is likely to make, most
+            likely first (center first, then moves that win or block). Stops between two
+            answers once stop is set.
+    Parameters:
+        board: board object with the player to move.
+        stop: threading.Event that is set when the player has moved.
+    Return: none
+    '''
+
+    def ponder(self, board, stop):
+        if self.level not in ("hard", "perfect"):
+            return
+        moves = {}
+        for reply in order_moves(board, 1):
+            if stop.is_set():
+                break
+            board.play(reply, 1)
+            if not board.terminal_node():
+                moves[board.get_key()] = self.search_move(board)
+            board.undo()
+            self.ponder_moves = moves
+
+    '''
+    Method: close. Releases the worker processes and the opening book.
+    Parameters: none
+    Return: none
+    '''
+
+    def close(self):
+        if self.search is not None:
+            self.search.close()
+        if self.book is not None:
+            self.book.close()
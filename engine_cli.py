@@ -0,0 +1,380 @@
+import argparse
+import sys
+import time
+from board import *
+from engine import Engine
+from game_record import COLUMN_CHARS
+
+'''
+File: engine_cli.py. Headless front end of the AI. Reads commands from stdin, one per line,
+                     and writes the answers to stdout, so the engine can be driven by other
+                     processes (tests, load tests, other front ends) without pygame, the
+                     webcam or the gesture model. The position and the engine (with its
+                     transposition table) are kept between commands.
+
+                     Positions are move strings: the columns played so far, one character
+                     per column as in the game log (see game_record.py), e.g. "4453". The
+                     columns are counted from 1: "1" to "9", then "a" to "z" on boards with
+                     more columns (--rows, --cols, --connect). Piece 1 plays the first move
+                     unless "set first 2" is used. Columns in the answers are written the
+                     same way.
+
+                     Commands:
+                         position [MOVES]    set the position (empty board without MOVES)
+                         play MOVES          play moves on the current position
+                         undo [N]            take back the last N moves (default 1)
+                         new                 empty board and a fresh engine
+                         go                  search the side to move and print
+                                             "info source SOURCE nodes N leaves N
+                                             terminals N cutoffs N cachehits N pv COLS..."
+                                             and "bestmove COL score S depth D time MS"
+                         set OPTION VALUE    level (easy, medium, hard, perfect), depth,
+                                             movetime (ms, 0 = fixed depth), workers,
+                                             book (on, off), endgame (cells) or first (1, 2)
+                         show                print the board, the move string and the side to move
+                         stats               print the counters of the engine
+                         isready             print "readyok"
+                         quit                stop
+
+                     Errors are answered with a line starting with "error".
+'''
+
+
+'''
+EngineShell Class: State of one headless session: the options, the engine built from them
+                   and the current position.
+'''
+
+
+class EngineShell:
+
+    '''
+    Method: EngineShell constructor.
+    Parameters:
+        level: level of the engine. Default is "hard".
+        depth: depth of tree exploration of the hard level. Default is 4.
+        movetime: time budget per move in milliseconds for the hard level (optional).
+        workers: number of worker processes of the hard level. Default is 1.
+        use_book: use the opening book of the hard level. Default is True.
+        endgame_cells: empty cells from which the hard level solves exactly. Default is 16.
+        out: stream the answers are written to. Default is sys.stdout.
+        row_board: number of rows of the board. Default is 6.
+        col_board: number of columns of the board (at most 35). Default is 7.
+        connect: number of pieces in a row needed to win. Default is 4.
+    Return: none
+    Raises:
+        ValueError: if the board cannot be played.
+    '''
+
+    def __init__(self, level="hard", depth=4, movetime=None, workers=1, use_book=True, endgame_cells=16,
+                 out=sys.stdout, row_board=6, col_board=7, connect=4):
+        if col_board > len(COLUMN_CHARS):
+            raise ValueError("move strings have one character per column, so at most %d columns"
+                             % len(COLUMN_CHARS))
+        self.size = (row_board, col_board, connect)
+        self.options = {
+            "level": level,
+            "depth": depth,
+            "movetime": movetime,
+            "workers": workers,
+            "book": use_book,
+            "endgame": endgame_cells,
+            "first": 1,
+        }
+        self.out = out
+        self.board = Board(*self.size)
+        self.engine = None
+        self.searches = 0
+        self.search_time = 0.0
+
+    '''
+    Method: get_engine. Engine of the session, built from the options on first use.
+    Parameters: none
+    Return:
+        engine: Engine object.
+    '''
+
+    def get_engine(self):
+        if self.engine is None:
+            options = self.options
+            self.engine = Engine(options["level"], options["depth"], options["movetime"], options["workers"],
+                                 options["book"], options["endgame"], move_delay=0, collect_stats=True,
+                                 row_board=self.size[0], col_board=self.size[1], connect=self.size[2])
+        return self.engine
+
+    '''
+    Method: reset_engine. Drops the engine so the next search builds a new one.
+    Parameters: none
+    Return: none
+    '''
+
+    def reset_engine(self):
+        if self.engine is not None:
+            self.engine.close()
+        self.engine = None
+
+    '''
+    Method: side_to_move. Piece to move in the current position.
+    Parameters: none
+    Return:
+        piece: 1 or 2.
+    '''
+
+    def side_to_move(self):
+        if len(self.board.moves) % 2 == 0:
+            return self.options["first"]
+        return 3 - self.options["first"]
+
+    '''
+    Method: write. Writes one answer line and flushes it, so a process reading the other end
+            of a pipe gets it at once.
+    Parameters:
+        line: text of the line.
+    Return: none
+    '''
+
+    def write(self, line):
+        self.out.write(line + "\n")
+        self.out.flush()
+
+    '''
+    Method: play_moves. Plays a move string on the current position. Nothing is played if
+            one of the moves is not valid.
+    Parameters:
+        moves: move string (one character of COLUMN_CHARS per move).
+    Return: none
+    Raises:
+        ValueError: if a move is not a column, the column is full or the game is over.
+    '''
+
+    def play_moves(self, moves):
+        played = 0
+        try:
+            for char in moves:
+                col = COLUMN_CHARS.find(char)
+                if col < 0 or col >= self.board.get_col_board():
+                    raise ValueError("invalid column %r" % char)
+                if self.board.terminal_node():
+                    raise ValueError("game is over before move %d" % (len(self.board.moves) + 1))
+                if not self.board.valid_move(col):
+                    raise ValueError("column %s is full" % char)
+                self.board.play(col, self.side_to_move())
+                played += 1
+        except ValueError:
+            for _ in range(played):
+                self.board.undo()
+            raise
+
+    '''
+    Method: move_string. Move string of the current position.
+    Parameters: none
+    Return:
+        moves: move string (one character of COLUMN_CHARS per move).
+    '''
+
+    def move_string(self):
+        return "".join(COLUMN_CHARS[col] for col in self.board.moves)
+
+    '''
+    Method: go. Searches the side to move and writes the best move.
+    Parameters: none
+    Return: none
+    Raises:
+        ValueError: if the game is over.
+    '''
+
+    def go(self):
+        if self.board.terminal_node():
+            raise ValueError("game is over")
+        engine = self.get_engine()
+        piece = self.side_to_move()
+        start = time.perf_counter()
+        column, score, depth = engine.analyse(self.board, piece)
+        elapsed = time.perf_counter() - start
+        self.searches += 1
+        self.search_time += elapsed
+
+        # scores of the engine are for piece 2; the protocol gives them for the side to move
+        if score is None:
+            score = "none"
+        else:
+            if piece == 1:
+                score = -score
+            if score == float('inf'):
+                score = "win"
+            elif score == float('-inf'):
+                score = "loss"
+            else:
+                score = "%g" % score
+        stats = engine.stats.get_stats()
+        self.write("info source %s nodes %d leaves %d terminals %d cutoffs %d cachehits %d pv %s" % (
+            stats["source"], stats["nodes"], stats["leaves"], stats["terminals"], stats["cutoffs"],
+            stats["cache_hits"], " ".join(COLUMN_CHARS[col] for col in stats["pv"]) or "-"))
+        self.write("bestmove %s score %s depth %d time %.1f" % (COLUMN_CHARS[column], score, depth, elapsed * 1000))
+
+    '''
+    Method: set_option. Changes an option. Options the engine is built from (level, workers,
+            book, endgame) drop the current engine and its tables.
+    Parameters:
+        name: option name.
+        value: option value as text.
+    Return: none
+    Raises:
+        ValueError: if the option or the value is not valid.
+    '''
+
+    def set_option(self, name, value):
+        if name == "level":
+            if value not in ("easy", "medium", "hard", "perfect"):
+                raise ValueError("unknown level %r" % value)
+            parsed = value
+        elif name == "book":
+            if value not in ("on", "off"):
+                raise ValueError("book must be on or off")
+            parsed = value == "on"
+        elif name in ("depth", "movetime", "workers", "endgame", "first"):
+            parsed = int(value)
+            if name == "movetime" and parsed == 0:
+                parsed = None
+            elif name in ("depth", "workers", "movetime") and parsed < 1:
+                raise ValueError("%s must be at least 1" % name)
+            elif name == "endgame" and parsed < 0:
+                raise ValueError("endgame must not be negative")
+            elif name == "first" and parsed not in (1, 2):
+                raise ValueError("first must be 1 or 2")
+        else:
+            raise ValueError("unknown option %r" % name)
+
+        if name == "first" and self.board.moves:
+            raise ValueError("first can only be changed on an empty board")
+        self.options[name] = parsed
+        if name in ("depth", "movetime"):
+            if self.engine is not None:
+                self.engine.ply = self.options["depth"]
+                self.engine.think_ms = self.options["movetime"]
+        elif name != "first":
+            self.reset_engine()
+
+    '''
+    Method: show. Writes the board (top row first, X for piece 1, O for piece 2), the move
+            string and the side to move or the result.
+    Parameters: none
+    Return: none
+    '''
+
+    def show(self):
+        symbols = {0: ".", 1: "X", 2: "O"}
+        board = self.board.get_board()
+        for row in reversed(range(self.board.get_row_board())):
+            self.write(" ".join(symbols[int(board[row][col])] for col in range(self.board.get_col_board())))
+        if self.board.get_winner():
+            state = "winner %d" % self.board.get_winner()
+        elif self.board.terminal_node():
+            state = "draw"
+        else:
+            state = "tomove %d" % self.side_to_move()
+        self.write("moves %s %s" % (self.move_string() or "-", state))
+
+    '''
+    Method: stats. Writes the counters of the session and of the engine's tables.
+    Parameters: none
+    Return: none
+    '''
+
+    def stats(self):
+        fields = [("searches", self.searches), ("search_ms", "%.1f" % (self.search_time * 1000))]
+        if self.engine is not None:
+            fields.append(("ponder_hits", self.engine.ponder_hits))
+            for name, value in sorted(self.engine.table.get_stats().items()):
+                fields.append(("table_" + name, "%.3f" % value if isinstance(value, float) else value))
+            if self.engine.solver is not None:
+                fields.append(("solver_nodes", self.engine.solver.nodes))
+        self.write("stats " + " ".join("%s %s" % field for field in fields))
+
+    '''
+    Method: handle. Runs one command line.
+    Parameters:
+        line: command line.
+    Return:
+        running: False after the quit command, True otherwise.
+    '''
+
+    def handle(self, line):
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        try:
+            if command == "quit":
+                return False
+            elif command == "isready":
+                self.write("readyok")
+            elif command == "position":
+                moves = "".join(args)
+                self.board = Board(*self.size)
+                self.play_moves(moves)
+            elif command == "play":
+                self.play_moves("".join(args))
+            elif command == "undo":
+                count = int(args[0]) if args else 1
+                if not 0 <= count <= len(self.board.moves):
+                    raise ValueError("cannot undo %d moves" % count)
+                for _ in range(count):
+                    self.board.undo()
+            elif command == "new":
+                self.board = Board(*self.size)
+                self.reset_engine()
+            elif command == "go":
+                self.go()
+            elif command == "set":
+                if len(args) != 2:
+                    raise ValueError("usage: set OPTION VALUE")
+                self.set_option(args[0], args[1])
+            elif command == "show":
+                self.show()
+            elif command == "stats":
+                self.stats()
+            else:
+                raise ValueError("unknown command %r" % command)
+        except ValueError as error:
+            self.write("error %s" % error)
+        return True
+
+    '''
+    Method: run. Reads and runs commands until quit or the end of the input.
+    Parameters:
+        lines: iterable of command lines. Default is sys.stdin.
+    Return: none
+    '''
+
+    def run(self, lines=sys.stdin):
+        try:
+            for line in lines:
+                if not self.handle(line):
+                    break
+        finally:
+            self.reset_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Connect 4 engine with a text protocol on stdin/stdout.")
+    parser.add_argument("--level", choices=("easy", "medium", "hard", "perfect"), default="hard",
+                        help="level of the engine (default hard)")
+    parser.add_argument("--depth", type=int, default=4, help="hard level: search depth (default 4)")
+    parser.add_argument("--movetime", type=int, metavar="MS",
+                        help="hard and perfect levels: time budget per move in milliseconds (instead of a "
+                             "fixed depth for hard)")
+    parser.add_argument("--workers", type=int, default=1, help="hard level: worker processes (default 1)")
+    parser.add_argument("--no-book", action="store_true", help="hard level: do not use the opening book")
+    parser.add_argument("--endgame-cells", type=int, default=16,
+                        help="hard level: solve exactly from N empty cells on (default 16, 0 = off)")
+    parser.add_argument("--rows", type=int, default=6, help="rows of the board (default 6)")
+    parser.add_argument("--cols", type=int, default=7, help="columns of the board, at most 35 (default 7)")
+    parser.add_argument("--connect", type=int, default=4, help="pieces in a row needed to win (default 4)")
+    args = parser.parse_args()
+    try:
+        shell = EngineShell(args.level, args.depth, args.movetime, args.workers, not args.no_book,
+                            args.endgame_cells, row_board=args.rows, col_board=args.cols, connect=args.connect)
+    except ValueError as error:
+        parser.error(str(error))
+    shell.run()
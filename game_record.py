@@ -0,0 +1,216 @@
+import os
+from board import *
+
+'''
+File: game_record.py. Compact record of a played game, one line of text per game, so a log of
+                      many games can be appended to cheaply and read back one game at a time.
+
+                      Line format (fields separated by spaces):
+                          MOVES key=value key=value ...
+                      MOVES is the move string: one character per move, the column counted
+                      from 1 ("1" to "9", then "a" to "z" for boards with more columns), e.g.
+                      "4453". The fields are:
+                          first=1|2        piece that moved first
+                          result=0|1|2|-   winner, 0 for a draw, - if the game was not finished
+                          size=6x7c4       rows, columns and connect length of the board
+                          ai=1|2           piece played by the AI (optional)
+                          level=hard       level of the AI (optional)
+                          depth=4          depth of the hard level (optional)
+                          movetime=200     time budget of the hard level in ms (optional)
+                          start=1700000000 unix time the game started (optional)
+                          ms=700,2310,...  milliseconds spent on every move (optional)
+                      Other key=value fields are kept as they are. Lines starting with # are
+                      comments.
+'''
+
+COLUMN_CHARS = "123456789abcdefghijklmnopqrstuvwxyz"
+DEFAULT_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "games.log")
+
+
+'''
+GameRecord Class: One game: the moves, who moved first, the result, the board size, the
+                  settings of the AI and the time spent on every move.
+'''
+
+
+class GameRecord:
+
+    '''
+    Method: GameRecord constructor.
+    Parameters:
+        first: piece that moves first. Default is 1.
+        row_board: number of rows of the board. Default is 6.
+        col_board: number of columns of the board. Default is 7.
+        connect: number of pieces in a row needed to win. Default is 4.
+        ai: piece played by the AI (optional).
+        level: level of the AI (optional).
+        depth: depth of the hard level (optional).
+        movetime: time budget of the hard level in milliseconds (optional).
+        start: unix time the game started (optional).
+    Return: none
+    '''
+
+    def __init__(self, first=1, row_board=6, col_board=7, connect=4, ai=None, level=None, depth=None,
+                 movetime=None, start=None):
+        self.first = first
+        self.size = (row_board, col_board, connect)
+        self.ai = ai
+        self.level = level
+        self.depth = depth
+        self.movetime = movetime
+        self.start = start
+        self.moves = []
+        self.times = []
+        self.result = None
+        self.extra = {}
+
+    '''
+    Method: add_move. Adds a move to the record.
+    Parameters:
+        col: column of the move (counted from 0).
+        seconds: time spent on the move (optional).
+    Return: none
+    '''
+
+    def add_move(self, col, seconds=None):
+        self.moves.append(col)
+        if seconds is not None:
+            self.times.append(int(round(seconds * 1000)))
+
+    '''
+    Method: piece_to_move. Piece that plays a move of the record.
+    Parameters:
+        ply: number of the move, counted from 0.
+    Return:
+        piece: 1 or 2.
+    '''
+
+    def piece_to_move(self, ply):
+        if ply % 2 == 0:
+            return self.first
+        return 3 - self.first
+
+    '''
+    Method: replay. Board of the position after a number of moves.
+    Parameters:
+        plies: number of moves to play. Default is all of them.
+    Return:
+        board: board object.
+    Raises:
+        ValueError: if a move is not valid on the board.
+    '''
+
+    def replay(self, plies=None):
+        board = Board(*self.size)
+        for ply, col in enumerate(self.moves[:plies]):
+            if not 0 <= col < board.get_col_board() or not board.valid_move(col) or board.terminal_node():
+                raise ValueError("move %d (column %d) is not valid" % (ply + 1, col + 1))
+            board.play(col, self.piece_to_move(ply))
+        return board
+
+    '''
+    Method: to_line. Record as one line of the log format (without the newline).
+    Parameters: none
+    Return:
+        line: text of the record.
+    '''
+
+    def to_line(self):
+        fields = ["".join(COLUMN_CHARS[col] for col in self.moves) or "-",
+                  "first=%d" % self.first,
+                  "result=%s" % ("-" if self.result is None else self.result),
+                  "size=%dx%dc%d" % self.size]
+        for name in ("ai", "level", "depth", "movetime", "start"):
+            value = getattr(self, name)
+            if value is not None:
+                fields.append("%s=%s" % (name, value))
+        if self.times:
+            fields.append("ms=" + ",".join(str(ms) for ms in self.times))
+        fields.extend("%s=%s" % item for item in self.extra.items())
+        return " ".join(fields)
+
+
+'''
+Function: parse_record. Reads one line of the log format.
+Parameters:
+    line: text of the record.
+Return:
+    record: GameRecord object.
+Raises:
+    ValueError: if the line is not a valid record.
+'''
+
+
+def parse_record(line):
+    words = line.split()
+    if not words:
+        raise ValueError("empty record")
+    record = GameRecord()
+    for word in words[1:]:
+        name, equals, value = word.partition("=")
+        if not equals:
+            raise ValueError("field %r is not key=value" % word)
+        if name == "first":
+            if value not in ("1", "2"):
+                raise ValueError("first must be 1 or 2")
+            record.first = int(value)
+        elif name == "result":
+            if value not in ("0", "1", "2", "-"):
+                raise ValueError("result must be 0, 1, 2 or -")
+            record.result = None if value == "-" else int(value)
+        elif name == "size":
+            rows, _, rest = value.partition("x")
+            cols, _, connect = rest.partition("c")
+            record.size = (int(rows), int(cols), int(connect))
+        elif name in ("ai", "depth", "movetime", "start"):
+            setattr(record, name, int(value))
+        elif name == "level":
+            record.level = value
+        elif name == "ms":
+            record.times = [int(ms) for ms in value.split(",") if ms]
+        else:
+            record.extra[name] = value
+
+    if words[0] != "-":
+        for char in words[0]:
+            col = COLUMN_CHARS.find(char)
+            if col < 0 or col >= record.size[1]:
+                raise ValueError("invalid column %r" % char)
+            record.moves.append(col)
+    if record.times and len(record.times) != len(record.moves):
+        raise ValueError("%d times for %d moves" % (len(record.times), len(record.moves)))
+    return record
+
+
+'''
+Function: append_record. Appends a record to a log file with a single write, so a game loop
+          only pays for one small append per game.
+Parameters:
+    record: GameRecord object.
+    path: log file. Default is games.log next to this file.
+Return: none
+'''
+
+
+def append_record(record, path=DEFAULT_LOG):
+    with open(path, "a") as f:
+        f.write(record.to_line() + "\n")
+
+
+'''
+Function: read_records. Streams the records of a log file, one line at a time, so logs of any
+          size can be read without loading them.
+Parameters:
+    path: log file. Default is games.log next to this file.
+Return:
+    generator of (line number, line) pairs of the record lines (comments and blank lines
+    are skipped; the lines are not parsed).
+'''
+
+
+def read_records(path=DEFAULT_LOG):
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield number, line
@@ -0,0 +1,318 @@
+import argparse
+import os
+import numpy as np
+
+'''
+File: gesture.py. Fast inference path of the hand gesture classifier. The mp_hand_gesture model
+                  is a small stack of dense layers (42 -> 64 -> 128 -> 512 -> 64 -> 32 -> 10),
+                  so instead of calling Keras model.predict for every frame the weights are
+                  loaded once and the forward pass is a chain of NumPy matmuls into buffers
+                  that are allocated up front.
+
+                  The weights are read from mp_hand_gesture.npz. Running the file exports them
+                  from the SavedModel checkpoint (this is the only step that needs TensorFlow).
+
+                  Smaller models trained by train_gesture.py are stored in the same format,
+                  optionally with int8 kernels (kernel_i as int8 plus a float kernel_scale_i)
+                  and with "normalize" set when they take normalized landmarks (see
+                  normalize_landmarks) instead of pixel coordinates.
+
+                  GestureEvents turns the per-frame gestures into debounced game events.
+'''
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, "mp_hand_gesture")
+WEIGHTS_FILE = os.path.join(BASE_DIR, "mp_hand_gesture.npz")
+NAMES_FILE = os.path.join(BASE_DIR, "gesture.names")
+LANDMARKS = 21
+
+# events of GestureEvents and the gestures that trigger them
+MOVE_LEFT = "left"
+MOVE_RIGHT = "right"
+DROP = "drop"
+GESTURE_EVENTS = {"okay": MOVE_LEFT, "peace": MOVE_RIGHT, "thumbs down": DROP}
+
+
+'''
+Function: export_weights. Reads the dense layer weights of the SavedModel checkpoint and saves
+          them as kernel_0, bias_0, kernel_1, ... in a .npz file.
+Parameters:
+    model_dir: SavedModel directory. Default is mp_hand_gesture.
+    path: .npz file to write. Default is mp_hand_gesture.npz.
+Return:
+    layers: number of dense layers exported.
+'''
+
+
+def export_weights(model_dir=MODEL_DIR, path=WEIGHTS_FILE):
+    import tensorflow as tf
+
+    reader = tf.train.load_checkpoint(os.path.join(model_dir, "variables", "variables"))
+    arrays = {}
+    layer = 0
+    while reader.has_tensor("layer_with_weights-%d/kernel/.ATTRIBUTES/VARIABLE_VALUE" % layer):
+        prefix = "layer_with_weights-%d/" % layer
+        arrays["kernel_%d" % layer] = reader.get_tensor(prefix + "kernel/.ATTRIBUTES/VARIABLE_VALUE")
+        arrays["bias_%d" % layer] = reader.get_tensor(prefix + "bias/.ATTRIBUTES/VARIABLE_VALUE")
+        layer += 1
+    np.savez(path, **arrays)
+    return layer
+
+
+'''
+Function: load_class_names. Reads the gesture names, one per line, in class id order.
+Parameters:
+    path: names file. Default is gesture.names.
+Return:
+    names: list of gesture names.
+'''
+
+
+def load_class_names(path=NAMES_FILE):
+    f = open(path, 'r')
+    names = f.read().split('\n')
+    f.close()
+    return names
+
+
+'''
+Function: normalize_landmarks. Makes landmarks independent of where the hand is in the frame
+          and of its size: the wrist (landmark 0) becomes the origin and the coordinates are
+          divided by the distance of the landmark farthest from the wrist.
+Parameters:
+    points: array of shape (..., 21, 2).
+    out: float32 array of the same shape to write the result into (optional).
+Return:
+    normalized: float32 array of shape (..., 21, 2).
+'''
+
+
+def normalize_landmarks(points, out=None):
+    if out is None:
+        out = np.empty(np.shape(points), dtype=np.float32)
+    np.subtract(points, points[..., :1, :], out=out, casting="unsafe")
+    scale = np.sqrt((out * out).sum(axis=-1).max(axis=-1, keepdims=True))
+    np.maximum(scale, 1e-6, out=scale)
+    out /= scale[..., None]
+    return out
+
+
+'''
+GestureClassifier Class: NumPy version of the mp_hand_gesture model. Gives the same class as
+                         np.argmax(model.predict([landmarks])) on the same landmarks.
+'''
+
+
+class GestureClassifier:
+
+    '''
+    Method: GestureClassifier constructor. Loads the weights and allocates all buffers.
+    Parameters:
+        path: .npz file with kernel_i and bias_i arrays (int8 kernels come with a
+              kernel_scale_i). Default is mp_hand_gesture.npz; it is exported from the
+              SavedModel first if it does not exist yet.
+        names_path: names file. Default is gesture.names.
+    Return: none
+    '''
+
+    def __init__(self, path=WEIGHTS_FILE, names_path=NAMES_FILE):
+        if path == WEIGHTS_FILE and not os.path.exists(path):
+            export_weights()
+        weights = np.load(path)
+        self.kernels = []
+        self.biases = []
+        while "kernel_%d" % len(self.kernels) in weights:
+            layer = len(self.kernels)
+            kernel = weights["kernel_%d" % layer].astype(np.float32)
+            if "kernel_scale_%d" % layer in weights:
+                kernel *= weights["kernel_scale_%d" % layer]
+            self.kernels.append(np.ascontiguousarray(kernel))
+            self.biases.append(np.ascontiguousarray(weights["bias_%d" % layer], dtype=np.float32))
+        self.class_names = load_class_names(names_path)
+        self.normalize = "normalize" in weights and bool(weights["normalize"])
+
+        # buffers reused for every frame
+        self.points = np.zeros((LANDMARKS, 2), dtype=np.float64)
+        self.landmarks = np.zeros((LANDMARKS, 2), dtype=np.float32)
+        self.inputs = self.landmarks.reshape(1, LANDMARKS * 2)
+        self.outputs = [np.zeros((1, kernel.shape[1]), dtype=np.float32) for kernel in self.kernels]
+        self.probabilities = self.outputs[-1][0]
+
+    '''
+    Method: set_landmarks. Copies the landmarks of a MediaPipe hand into the input buffer,
+            scaled and truncated to pixels the same way the game always did
+            (int(lm.x * x), int(lm.y * y) with x, y, c = frame.shape).
+    Parameters:
+        hand: MediaPipe hand landmarks (an item of result.multi_hand_landmarks).
+        x: first dimension of the frame shape.
+        y: second dimension of the frame shape.
+    Return: none
+    '''
+
+    def set_landmarks(self, hand, x, y):
+        points = self.points
+        for index, lm in enumerate(hand.landmark):
+            points[index, 0] = lm.x
+            points[index, 1] = lm.y
+        points[:, 0] *= x
+        points[:, 1] *= y
+        np.trunc(points, out=points)
+        if self.normalize:
+            normalize_landmarks(points, out=self.landmarks)
+        else:
+            self.landmarks[...] = points
+
+    '''
+    Method: forward. Runs the dense layers on the input buffer: ReLU after every layer and
+            softmax after the last one.
+    Parameters: none
+    Return:
+        probabilities: array with the probability of every gesture (a view of a buffer that
+                       is overwritten by the next call).
+    '''
+
+    def forward(self):
+        values = self.inputs
+        last = len(self.kernels) - 1
+        for layer in range(len(self.kernels)):
+            out = self.outputs[layer]
+            np.matmul(values, self.kernels[layer], out=out)
+            out += self.biases[layer]
+            if layer < last:
+                np.maximum(out, 0, out=out)
+            values = out
+        values -= values.max()
+        np.exp(values, out=values)
+        values /= values.sum()
+        return self.probabilities
+
+    '''
+    Method: predict. Classifies a batch of landmark arrays (used offline, e.g. on data.pickle).
+    Parameters:
+        landmarks: array of shape (batch, 21, 2).
+    Return:
+        probabilities: array of shape (batch, number of gestures).
+    '''
+
+    def predict(self, landmarks):
+        if self.normalize:
+            values = normalize_landmarks(landmarks)
+        else:
+            values = np.asarray(landmarks, dtype=np.float32)
+        values = values.reshape(len(landmarks), LANDMARKS * 2)
+        last = len(self.kernels) - 1
+        for layer in range(len(self.kernels)):
+            values = values @ self.kernels[layer] + self.biases[layer]
+            if layer < last:
+                values = np.maximum(values, 0)
+        values = np.exp(values - values.max(axis=1, keepdims=True))
+        return values / values.sum(axis=1, keepdims=True)
+
+    '''
+    Method: classify. Classifies the gesture of a MediaPipe hand.
+    Parameters:
+        hand: MediaPipe hand landmarks.
+        x: first dimension of the frame shape.
+        y: second dimension of the frame shape.
+    Return:
+        class_name: name of the gesture.
+        confidence: probability of the gesture.
+    '''
+
+    def classify(self, hand, x, y):
+        self.set_landmarks(hand, x, y)
+        probabilities = self.forward()
+        class_id = int(probabilities.argmax())
+        return self.class_names[class_id], float(probabilities[class_id])
+
+
+'''
+GestureEvents Class: Debounces the gestures of the classifier into game events. A gesture
+                     becomes active once it was classified with enough confidence for a
+                     hold time, and stays active until a different (or no) gesture was
+                     seen for a release time, so a few noisy frames neither start nor stop
+                     an action. Every activation emits one event: a drop needs the hand
+                     to leave the thumbs down gesture before the next drop. While a move
+                     gesture is active, direction tells which way the coin moves.
+                     All times are in seconds, so the behaviour does not depend on the
+                     camera frame rate.
+'''
+
+
+class GestureEvents:
+
+    '''
+    Method: GestureEvents constructor.
+    Parameters:
+        min_confidence: gestures classified with a lower probability count as no gesture.
+                        Default is 0.8.
+        hold_time: seconds a move gesture has to be seen before it becomes active. Default is 0.1.
+        drop_time: seconds the thumbs down gesture has to be seen before the drop. Default is 0.3.
+        release_time: seconds without the active gesture before it is released. Default is 0.2.
+    Return: none
+    '''
+
+    def __init__(self, min_confidence=0.8, hold_time=0.1, drop_time=0.3, release_time=0.2):
+        self.min_confidence = min_confidence
+        self.hold_time = hold_time
+        self.drop_time = drop_time
+        self.release_time = release_time
+        self.active = None
+        self.candidate = None
+        self.candidate_since = 0.0
+
+    '''
+    Method: update. Feeds the gesture of one frame into the state machine.
+    Parameters:
+        class_name: name of the gesture given by the classifier ('' if no hand was found).
+        confidence: probability of the gesture.
+        now: time of the frame in seconds (e.g. time.monotonic()).
+    Return:
+        events: list with the event started on this frame (MOVE_LEFT, MOVE_RIGHT or DROP),
+                empty if nothing changed.
+    '''
+
+    def update(self, class_name, confidence, now):
+        if confidence < self.min_confidence or class_name not in GESTURE_EVENTS:
+            class_name = None
+        if class_name != self.candidate:
+            self.candidate = class_name
+            self.candidate_since = now
+        if class_name == self.active:
+            return []
+
+        if class_name is None:
+            wait = self.release_time
+        elif GESTURE_EVENTS[class_name] == DROP:
+            wait = self.drop_time
+        else:
+            wait = self.hold_time
+        if now - self.candidate_since < wait:
+            return []
+        self.active = class_name
+        if class_name is None:
+            return []
+        return [GESTURE_EVENTS[class_name]]
+
+    '''
+    Method: direction. Direction of the coin for the active gesture.
+    Parameters: none
+    Return:
+        direction: -1 (left), 1 (right) or 0 (no move gesture active).
+    '''
+
+    def direction(self):
+        event = GESTURE_EVENTS.get(self.active)
+        if event == MOVE_LEFT:
+            return -1
+        if event == MOVE_RIGHT:
+            return 1
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the mp_hand_gesture weights for GestureClassifier.")
+    parser.add_argument("--model", default=MODEL_DIR, help="SavedModel directory (default mp_hand_gesture)")
+    parser.add_argument("--output", default=WEIGHTS_FILE, help=".npz file (default mp_hand_gesture.npz)")
+    args = parser.parse_args()
+    print("exported %d layers to %s" % (export_weights(args.model, args.output), args.output))
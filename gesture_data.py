@@ -0,0 +1,168 @@
+import argparse
+import os
+import pickle
+import time
+import numpy as np
+from gesture import BASE_DIR, LANDMARKS, load_class_names
+
+'''
+File: gesture_data.py. Compact format of the gesture samples of data.pickle. The pickle holds
+                       nested lists of [label, [[x, y] x 21]] samples, which has to be
+                       unpickled completely before any sample can be used. The converted
+                       dataset is two .npy files:
+                           landmarks.npy: int16 array of shape (N, 21, 2), pixel coordinates.
+                           labels.npy: uint8 array of shape (N,), class ids in the order of
+                                       gesture.names.
+                       Both are loaded memory-mapped, so opening the dataset reads nothing
+                       and slices of it are views into the files.
+
+                       Running the file converts data.pickle and checks the round trip.
+'''
+
+DATA_FILE = os.path.join(BASE_DIR, "data.pickle")
+DATASET_DIR = os.path.join(BASE_DIR, "gesture_data")
+LANDMARKS_FILE = "landmarks.npy"
+LABELS_FILE = "labels.npy"
+
+
+'''
+Function: load_pickle. Reads the samples of data.pickle.
+Parameters:
+    path: pickle file. Default is data.pickle.
+Return:
+    samples: list of [label, [[x, y] x 21]] samples.
+'''
+
+
+def load_pickle(path=DATA_FILE):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+'''
+Function: samples_to_arrays. Turns samples into the landmark and label arrays.
+Parameters:
+    samples: list of [label, [[x, y] x 21]] samples.
+    class_count: number of gesture classes; labels must be below it.
+Return:
+    landmarks: int16 array of shape (N, 21, 2).
+    labels: uint8 array of shape (N,).
+Raises:
+    ValueError: if a sample does not have 21 landmarks, a coordinate does not fit in an
+                int16 or a label is not a class id.
+'''
+
+
+def samples_to_arrays(samples, class_count):
+    labels = np.array([sample[0] for sample in samples], dtype=np.int64)
+    points = np.array([sample[1] for sample in samples], dtype=np.int64)
+    if points.shape[1:] != (LANDMARKS, 2):
+        raise ValueError("samples must have %d landmarks of 2 coordinates, got shape %s"
+                         % (LANDMARKS, points.shape[1:]))
+    info = np.iinfo(np.int16)
+    if points.size and (points.min() < info.min or points.max() > info.max):
+        raise ValueError("landmark coordinates do not fit in int16")
+    if labels.size and (labels.min() < 0 or labels.max() >= class_count):
+        raise ValueError("labels must be class ids between 0 and %d" % (class_count - 1))
+    return points.astype(np.int16), labels.astype(np.uint8)
+
+
+'''
+Function: convert. Converts data.pickle into the dataset directory.
+Parameters:
+    pickle_path: pickle file. Default is data.pickle.
+    directory: dataset directory. Default is gesture_data.
+Return:
+    count: number of samples written.
+'''
+
+
+def convert(pickle_path=DATA_FILE, directory=DATASET_DIR):
+    landmarks, labels = samples_to_arrays(load_pickle(pickle_path), len(load_class_names()))
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, LANDMARKS_FILE), landmarks)
+    np.save(os.path.join(directory, LABELS_FILE), labels)
+    return len(labels)
+
+
+'''
+Function: load_dataset. Opens the dataset without reading it.
+Parameters:
+    directory: dataset directory. Default is gesture_data.
+    mmap: memory-map the arrays (True) or read them into memory (False). Default is True.
+Return:
+    landmarks: int16 array of shape (N, 21, 2).
+    labels: uint8 array of shape (N,).
+'''
+
+
+def load_dataset(directory=DATASET_DIR, mmap=True):
+    mode = "r" if mmap else None
+    landmarks = np.load(os.path.join(directory, LANDMARKS_FILE), mmap_mode=mode)
+    labels = np.load(os.path.join(directory, LABELS_FILE), mmap_mode=mode)
+    if landmarks.shape != (len(labels), LANDMARKS, 2):
+        raise ValueError("%s: landmarks and labels do not match" % directory)
+    return landmarks, labels
+
+
+'''
+Function: iterate_batches. Goes through the dataset in batches. In order, every batch is a
+          slice (a view of the memory-mapped file, nothing is copied). Shuffled, only the
+          samples of the current batch are gathered into a new array.
+Parameters:
+    landmarks: landmark array of load_dataset.
+    labels: label array of load_dataset.
+    batch_size: number of samples per batch (the last batch may be smaller).
+    shuffle: go through the samples in a random order. Default is False.
+    seed: seed of the random order.
+Return:
+    generator of (landmarks, labels) batches.
+'''
+
+
+def iterate_batches(landmarks, labels, batch_size, shuffle=False, seed=0):
+    count = len(labels)
+    if not shuffle:
+        for start in range(0, count, batch_size):
+            yield landmarks[start:start + batch_size], labels[start:start + batch_size]
+        return
+    order = np.random.default_rng(seed).permutation(count)
+    for start in range(0, count, batch_size):
+        # sorted indices read the file front to back
+        indices = np.sort(order[start:start + batch_size])
+        yield landmarks[indices], labels[indices]
+
+
+'''
+Function: arrays_to_samples. Turns the arrays back into the sample lists of data.pickle.
+Parameters:
+    landmarks: landmark array.
+    labels: label array.
+Return:
+    samples: list of [label, [[x, y] x 21]] samples with Python ints.
+'''
+
+
+def arrays_to_samples(landmarks, labels):
+    return [[label, points] for label, points in zip(labels.tolist(), landmarks.tolist())]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert data.pickle into memory-mappable NumPy arrays.")
+    parser.add_argument("--input", default=DATA_FILE, help="pickle file (default data.pickle)")
+    parser.add_argument("--output", default=DATASET_DIR, help="dataset directory (default gesture_data)")
+    args = parser.parse_args()
+
+    count = convert(args.input, args.output)
+    start = time.perf_counter()
+    samples = load_pickle(args.input)
+    pickle_time = time.perf_counter() - start
+    start = time.perf_counter()
+    landmarks, labels = load_dataset(args.output)
+    load_time = time.perf_counter() - start
+    if arrays_to_samples(landmarks, labels) != samples:
+        raise SystemExit("round trip failed: %s does not match %s" % (args.output, args.input))
+
+    size = sum(os.path.getsize(os.path.join(args.output, name)) for name in (LANDMARKS_FILE, LABELS_FILE))
+    print("wrote %d samples to %s (%d bytes, pickle %d bytes)" % (count, args.output, size, os.path.getsize(args.input)))
+    print("load: pickle %.1f ms, memory-mapped %.2f ms; round trip exact" % (pickle_time * 1000, load_time * 1000))
@@ -1,34 +1,163 @@
 # IMPORT GAME AND CLASSES
+import time
+START_TIME = time.perf_counter()
 import pygame
 import sys
+import argparse
 import math
 from pygame.constants import MOUSEBUTTONDOWN
 from board import *
 from GUI import *
-from AIOpponent import *
+from engine import Engine
+from game_record import GameRecord, append_record, DEFAULT_LOG
+from capture import FrameGrabber
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 
-# GESTURES IMPORT
-import cv2
+# GESTURES IMPORT (cv2, mediapipe and the gesture model are loaded by load_vision)
 import numpy as np
-import mediapipe as mp
-import tensorflow as tf
-from tensorflow.keras.models import load_model
+from gesture import GestureClassifier, GestureEvents, DROP
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Play Connect 4 against the AI with hand gestures.")
+    levels = parser.add_mutually_exclusive_group(required=True)
+    levels.add_argument("--easy", action="store_true",
+                        help="AI drops pieces in random columns")
+    levels.add_argument("--medium", action="store_true",
+                        help="AI looks one move ahead")
+    levels.add_argument("--hard", nargs="?", const=4, type=int, metavar="PLY",
+                        help="AI searches PLY moves ahead with alpha-beta (default 4)")
+    levels.add_argument("--perfect", action="store_true",
+                        help="AI plays the opening book and a timed search per move (1 s unless "
+                             "--think-ms is given), then solves every position exactly from 24 "
+                             "empty cells on")
+    parser.add_argument("--think-ms", type=int, metavar="MS",
+                        help="hard and perfect levels: search deeper and deeper for MS milliseconds "
+                             "per move (instead of a fixed PLY with --hard)")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="hard level only: search the root columns in N worker processes")
+    parser.add_argument("--no-book", action="store_true",
+                        help="hard and perfect levels: search the opening moves instead of using the opening book")
+    parser.add_argument("--endgame-cells", type=int, metavar="N",
+                        help="hard level only: solve the game exactly once N or fewer cells are "
+                             "empty (default 16, 0 turns it off)")
+    parser.add_argument("--gesture-model", metavar="PATH",
+                        help="gesture model (.npz) to use instead of mp_hand_gesture, "
+                             "e.g. gesture_small.npz from train_gesture.py")
+    parser.add_argument("--log-stats", action="store_true",
+                        help="print the search statistics of every AI move")
+    parser.add_argument("--record", default=DEFAULT_LOG, metavar="PATH",
+                        help="log file the game is appended to (default games.log)")
+    parser.add_argument("--no-record", action="store_true", help="do not record the game")
+    parser.add_argument("--rows", type=int, default=6, help="rows of the board (default 6)")
+    parser.add_argument("--cols", type=int, default=7, help="columns of the board (default 7)")
+    parser.add_argument("--connect", type=int, default=4, metavar="N",
+                        help="pieces in a row needed to win (default 4)")
+    args = parser.parse_args()
+    if args.hard is not None and args.hard < 1:
+        parser.error("--hard: PLY must be at least 1")
+    if args.think_ms is not None and args.hard is None and not args.perfect:
+        parser.error("--think-ms can only be used with --hard or --perfect")
+    if args.think_ms is not None and args.think_ms < 1:
+        parser.error("--think-ms: MS must be at least 1")
+    if args.workers != 1 and args.hard is None:
+        parser.error("--workers can only be used with --hard")
+    if args.workers < 1:
+        parser.error("--workers: N must be at least 1")
+    if args.endgame_cells is not None and args.hard is None:
+        parser.error("--endgame-cells can only be used with --hard")
+    if args.endgame_cells is None:
+        args.endgame_cells = 16
+    if args.endgame_cells < 0:
+        parser.error("--endgame-cells: N must not be negative")
+    if args.rows < 1 or args.cols < 1:
+        parser.error("--rows and --cols must be at least 1")
+    try:
+        Board(args.rows, args.cols, args.connect)
+    except ValueError as error:
+        parser.error(str(error))
+    return args
+
+
+'''
+Function: load_vision. Loads everything the hand gestures need: imports cv2 and mediapipe,
+          creates the hand tracker and the gesture classifier and opens the webcam. This is
+          the slow part of the start-up, so it runs on a background thread while the board
+          is already on screen.
+Parameters:
+    model_path: .npz file of the gesture model (optional, default mp_hand_gesture).
+Return:
+    vision: dictionary with the cv2 module, the mediapipe hands module, drawing utilities
+            and hand tracker, the gesture classifier, the webcam and its frame grabber
+            (already started).
+'''
+
+
+def load_vision(model_path=None):
+    import cv2
+    import mediapipe as mp
+
+    mpHands = mp.solutions.hands
+    vision = {
+        "cv2": cv2,
+        "mpHands": mpHands,
+        "mpDraw": mp.solutions.drawing_utils,
+        "hands": mpHands.Hands(max_num_hands=1, min_detection_confidence=0.7),
+        "classifier": GestureClassifier(model_path) if model_path else GestureClassifier(),
+        "cap": cv2.VideoCapture(0),
+    }
+    vision["grabber"] = FrameGrabber(vision["cap"])
+    vision["grabber"].start()
+    return vision
+
+
+'''
+Function: report_startup. Prints how long each start-up step took, counted from the start
+          of the program.
+Parameters:
+    marks: list of (step, time.perf_counter() value) pairs in the order they happened.
+Return: none
+'''
+
+
+def report_startup(marks):
+    print("start-up:")
+    for step, at in marks:
+        print("  %-16s %7.0f ms" % (step, (at - START_TIME) * 1000))
 
 
 async def main_game():
     # command line arguments
-    arg = sys.argv[1]
-    if arg == "--easy":
+    args = parse_arguments()
+    if args.easy:
         level = "easy"
-    elif arg == "--medium":
+    elif args.medium:
         level = "medium"
-    elif arg == "--hard":
+    elif args.perfect:
+        level = "perfect"
+    else:
         level = "hard"
+    startup = [("imports", time.perf_counter())]
+    engine = Engine(level, args.hard, args.think_ms, args.workers, not args.no_book, args.endgame_cells,
+                    collect_stats=args.log_stats, row_board=args.rows, col_board=args.cols, connect=args.connect)
+
+    # the AI searches on its own thread so the camera and the window keep running;
+    # one thread keeps the engine's work (moves and pondering) in order.
+    loop = asyncio.get_running_loop()
+    ai_executor = ThreadPoolExecutor(max_workers=1)
+    ai_move = None
+    ponder_stop = threading.Event()
+    startup.append(("engine", time.perf_counter()))
+
+    # the camera and gesture models load in the background while the board is shown
+    vision_future = loop.run_in_executor(None, load_vision, args.gesture_model)
 
     # initialize board and game
-    board = Board()
+    board = Board(args.rows, args.cols, args.connect)
     game_state = False
     switch_players = 1
     size = ((board.get_col_board() * 100), (board.get_row_board() + 1) * 100)
@@ -48,33 +177,48 @@ async def main_game():
 
     pygame.font.init()
     myfont = pygame.font.SysFont('Comic Sans MS', 125)
-    pygame.display.update()
 
-    # initialize mediapipe
-    mpHands = mp.solutions.hands
-    hands = mpHands.Hands(max_num_hands=1, min_detection_confidence=0.7)
-    mpDraw = mp.solutions.drawing_utils
-
-    # Load the gesture recognizer model
-    model = load_model('mp_hand_gesture')
-
-    # Load class names
-    f = open('gesture.names', 'r')
-    classNames = f.read().split('\n')
-    f.close()
-    # print(classNames)
+    startup.append(("board drawn", time.perf_counter()))
+
+    # Loading state until the camera and the gesture models are ready
+    loading_font = pygame.font.SysFont('Comic Sans MS', 40)
+    connect.draw_strip(loading_font.render("Loading camera...", 1, BLUE))
+    while not vision_future.done():
+        pygame.event.pump()
+        await asyncio.sleep(0.05)
+    vision = vision_future.result()
+    cv2 = vision["cv2"]
+    mpHands = vision["mpHands"]
+    mpDraw = vision["mpDraw"]
+    hands = vision["hands"]
+    classifier = vision["classifier"]
+    cap = vision["cap"]
+    grabber = vision["grabber"]
+    startup.append(("camera loaded", time.perf_counter()))
+    gestures = GestureEvents()
+
+    # the AI (piece 2) moves first; every move is recorded with the time it took
+    record = None
+    if not args.no_record:
+        record = GameRecord(2, args.rows, args.cols, args.connect, ai=2, level=level, depth=args.hard,
+                            movetime=args.think_ms, start=int(time.time()))
+    turn_start = time.monotonic()
 
     # Initializing Disc
     posx = (board.get_col_board() * 100) / 2
-    pygame.draw.rect(screen, WHITE, (0, 0, (board.get_col_board() * 100), 100))
-    pygame.draw.circle(screen, RED, (posx, int(100 / 2)), (int(100 / 2 - 5)))
+    # coin speed in pixels per second (10 pixels per frame at 30 frames per second)
+    coin_speed = 300
+    connect.draw_strip()
+    connect.draw_cursor(posx, RED)
 
-    # Initialize the webcam
-    cap = cv2.VideoCapture(0)
+    last_time = time.monotonic()
 
     while not game_state:
-        # Read each frame from the webcam
-        _, frame = cap.read()
+        # Take the newest frame from the webcam thread
+        frame = grabber.read(timeout=1)
+        if frame is None:
+            await asyncio.sleep(0)
+            continue
         x, y, c = frame.shape
 
         # Flip the frame vertically
@@ -84,113 +228,124 @@ async def main_game():
         # Get hand landmark prediction
         result = hands.process(framergb)
         className = ''
+        confidence = 0.0
         # post process the result
         if result.multi_hand_landmarks:
-            landmarks = []
             for handslms in result.multi_hand_landmarks:
-                for lm in handslms.landmark:
-                    # print(id, lm)
-                    lmx = int(lm.x * x)
-                    lmy = int(lm.y * y)
-
-                    landmarks.append([lmx, lmy])
-
                 # Drawing landmarks on frames
                 mpDraw.draw_landmarks(
                     frame, handslms, mpHands.HAND_CONNECTIONS)
 
                 # Predict gesture
-                prediction = model.predict([landmarks])
-                # print(prediction)
-                classID = np.argmax(prediction)
-                className = classNames[classID]
+                className, confidence = classifier.classify(handslms, x, y)
 
         # show the prediction on the frame
         cv2.putText(frame, className, (10, 50), cv2.FONT_HERSHEY_SIMPLEX,
                     1, (0, 0, 255), 2, cv2.LINE_AA)
 
-        # Coin goes right
-        if className == "peace":
-            pygame.draw.rect(
-                screen, WHITE, (0, 0, (board.get_col_board() * 100), 100))
-            if(posx < (board.get_col_board() * 100)-(100/2)):
-                posx += 10
-            if switch_players == 0:
-                pygame.draw.circle(
-                    screen, RED, (posx, int(100 / 2)), (int(100 / 2 - 5)))
-
-        # Coin goes left
-        if className == "okay":
-            pygame.draw.rect(
-                screen, WHITE, (0, 0, (board.get_col_board() * 100), 100))
-            if(posx > 100/2):
-                posx -= 10
+        # Debounce the gesture into events
+        now = time.monotonic()
+        # a stalled camera must not make the coin jump
+        elapsed = min(now - last_time, 0.1)
+        last_time = now
+        events = gestures.update(className, confidence, now)
+
+        # Coin goes right or left while peace or okay is held
+        direction = gestures.direction()
+        if direction != 0:
+            posx += direction * coin_speed * elapsed
+            posx = min(max(posx, 100/2), (board.get_col_board() * 100)-(100/2))
             if switch_players == 0:
-                pygame.draw.circle(
-                    screen, RED, (posx, int(100 / 2)), (int(100 / 2 - 5)))
+                connect.draw_cursor(posx, RED)
 
         # Coin Drops
-        if className == "thumbs down":
-            await asyncio.sleep(1)
-            pygame.draw.rect(
-                screen, WHITE, (0, 0, (board.get_col_board() * 100), 100))
+        if DROP in events:
+            connect.draw_cursor(posx)
             if switch_players == 0:
                 col = int(math.floor(posx / 100))
                 if board.valid_move(col):
                     row = board.open_row(col)
                     board.drop_piece(row, col, 1)
+                    connect.draw_move(row, col)
+                    if record is not None:
+                        record.add_move(col, now - turn_start)
+                    turn_start = now
                     if board.winning_move(1):
-                        label = myfont.render("Red wins!!", 1, RED)
-                        screen.blit(label, (130, 20))
+                        connect.draw_strip(myfont.render("Red wins!!", 1, RED), (130, 20))
+                        game_state = True
+                    elif board.terminal_node():
+                        connect.draw_strip(myfont.render("Draw!!", 1, BLUE), (130, 20))
                         game_state = True
-                connect = Connect4GUI(100, board.get_col_board() * 100,
-                                      (board.get_row_board() + 1) * 100, WHITE, BLUE, RED, GREEN, board)
-                connect.draw_game()
 
-                switch_players = 1
-                await asyncio.sleep(1)
+                    switch_players = 1
 
-        pygame.display.update()
         #  Ask for Player 2 Input
-        if switch_players == 1 and not game_state:
-
-            # difficulty levels
-            if level == "easy":
-                col = easy()
-            elif level == "medium":
-                col = medium(board)
-            elif level == "hard":
-                col, score = hard(board, 4, True)
-
-            if board.valid_move(col):
-                row = board.open_row(col)
-                board.drop_piece(row, col, 2)
-                if board.winning_move(2):
-                    label = myfont.render("Green wins!!", 1, GREEN)
-                    screen.blit(label, (130, 20))
-                    game_state = True
-                    connect = Connect4GUI(100, board.get_col_board() * 100,
-                                          (board.get_row_board() + 1) * 100, WHITE, BLUE, RED, GREEN, board)
-                    connect.draw_game()
-
+        if switch_players == 1 and not game_state and ai_move is None:
+            ponder_stop.set()
+            ai_move = loop.run_in_executor(ai_executor, engine.choose_move, copy_board(board))
+
+        if ai_move is not None and ai_move.done():
+            col = ai_move.result()
+            ai_move = None
+            if args.log_stats:
+                print("AI move %d: %s" % (col, engine.stats.summary()))
+
+            # the engine only answers with columns that are not full
+            row = board.open_row(col)
+            board.drop_piece(row, col, 2)
+            connect.draw_move(row, col)
+            if record is not None:
+                record.add_move(col, time.monotonic() - turn_start)
+            turn_start = time.monotonic()
+            if board.winning_move(2):
+                connect.draw_strip(myfont.render("Green wins!!", 1, GREEN), (130, 20))
+                game_state = True
+            elif board.terminal_node():
+                connect.draw_strip(myfont.render("Draw!!", 1, BLUE), (130, 20))
+                game_state = True
+            else:
                 # Showing disc for the user to play
-                pygame.draw.circle(
-                    screen, RED, (posx, int(100 / 2)), (int(100 / 2 - 5)))
+                connect.draw_cursor(posx, RED)
 
-                switch_players = 0
+            switch_players = 0
+
+            # think about the answers to the player's move while the player decides
+            if not game_state:
+                ponder_stop = threading.Event()
+                loop.run_in_executor(ai_executor, engine.ponder, copy_board(board), ponder_stop)
 
         if game_state:
             pygame.time.wait(5000)
 
         # Show the final output
         cv2.imshow("Output", frame)
+        if startup[-1][0] != "first frame":
+            startup.append(("first frame", time.perf_counter()))
+            report_startup(startup)
 
         if cv2.waitKey(1) == ord('q'):
             break
 
+        # let the event loop pick up the result of the AI thread
+        await asyncio.sleep(0)
+
+    # one append per game; unfinished games are kept too
+    if record is not None and record.moves:
+        if board.get_winner():
+            record.result = board.get_winner()
+        elif board.terminal_node():
+            record.result = 0
+        append_record(record, args.record)
+
     # release the webcam and destroy all active windows
+    grabber.stop()
     cap.release()
+    print("frames: %(captured)d captured, %(processed)d processed, %(dropped)d dropped" % grabber.get_stats())
+    ponder_stop.set()
+    ai_executor.shutdown()
+    engine.close()
 
     cv2.destroyAllWindows()
 
-asyncio.run(main_game())
+if __name__ == "__main__":
+    asyncio.run(main_game())
@@ -0,0 +1,201 @@
+import argparse
+import math
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from board import *
+from AIOpponent import *
+from transposition import TranspositionTable
+
+'''
+File: opening_book.py. Opening book of the hard level. The first moves of a game are searched
+                       once offline and stored in a small binary file, so the AI answers
+                       them instantly during the game.
+
+                       File format (little-endian):
+                           header: magic b"C4BK", version, rows, columns, plies, depth and
+                                   number of records ("<4sHBBBBI", 14 bytes).
+                           records: sorted by key, each one is the position key of
+                                    Board.get_key(), the best column and its score
+                                    ("<QBf", 13 bytes).
+
+                       The book only holds positions where the AI (piece 2) is to move, for
+                       games started by either side. Running the file generates the book.
+'''
+
+BOOK_MAGIC = b"C4BK"
+BOOK_VERSION = 1
+HEADER = struct.Struct("<4sHBBBBI")
+RECORD = struct.Struct("<QBf")
+KEY = struct.Struct("<Q")
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+
+'''
+OpeningBook Class: Read-only opening book. The file is memory-mapped, so opening the book
+                   costs almost nothing and only the pages touched by a lookup are read.
+'''
+
+
+class OpeningBook:
+
+    '''
+    Method: OpeningBook constructor. Memory-maps a book file.
+    Parameters:
+        path: path of the book file. Default is opening_book.bin next to this file.
+    Return: none
+    '''
+
+    def __init__(self, path=DEFAULT_BOOK):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, self.plies, self.depth, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            self.close()
+            raise ValueError("%s is not an opening book" % path)
+        if len(self.data) != HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise ValueError("%s is truncated" % path)
+
+    '''
+    Method: lookup. Binary search of a position in the book. The book is built for connect 4
+            on a board of the size in its header; other boards are never in it.
+    Parameters:
+        board: board object with the AI (piece 2) to move.
+    Return:
+        (column, score): best column and its score if the position is in the book.
+        None: if the position is not in the book.
+    '''
+
+    def lookup(self, board):
+        if board.get_row_board() != self.rows or board.get_col_board() != self.cols or board.get_connect() != 4:
+            return None
+        key = board.get_key()
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            found = KEY.unpack_from(self.data, offset)[0]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                column, score = RECORD.unpack_from(self.data, offset)[1:]
+                if not board.valid_move(column):
+                    return None
+                if math.isfinite(score):
+                    score = int(score)
+                return column, score
+        return None
+
+    '''
+    Method: close. Unmaps and closes the book file.
+    Parameters: none
+    Return: none
+    '''
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+'''
+Function: load_book. Opens the default opening book if it exists.
+Parameters:
+    path: path of the book file. Default is opening_book.bin next to this file.
+Return:
+    book: OpeningBook object, or None if there is no book file.
+'''
+
+
+def load_book(path=DEFAULT_BOOK):
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+'''
+Function: search_position. Task of the book generator: searches one position.
+Parameters:
+    moves: list of (column, piece) moves that lead to the position.
+    depth: depth of tree exploration.
+Return:
+    key: position key of the board.
+    column: best column for the AI.
+    score: score of the best column.
+'''
+
+
+def search_position(moves, depth):
+    board = Board()
+    for col, piece in moves:
+        board.play(col, piece)
+    column, score = hard(board, depth, True, TranspositionTable())
+    return board.get_key(), column, score
+
+
+'''
+Function: generate_book. Builds the opening book. Starting from the empty board (AI first)
+          and from every first move of the player (player first), the AI move of every
+          position is searched to the given depth and every possible answer of the player
+          is added to the next layer, until the given number of plies is reached. Positions
+          of one layer are searched in parallel.
+Parameters:
+    path: path of the book file to write.
+    plies: number of plies (moves of both sides) covered by the book.
+    depth: depth of tree exploration of every book position.
+    workers: number of worker processes.
+Return:
+    count: number of positions in the book.
+'''
+
+
+def generate_book(path, plies, depth, workers=None):
+    board = Board()
+    layer = [[]]
+    layer += [[(col, 1)] for col in range(board.get_col_board())]
+    records = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while layer:
+            layer = [moves for moves in layer if len(moves) < plies]
+            results = executor.map(search_position, layer, [depth] * len(layer))
+            next_layer = []
+            for moves, (key, column, score) in zip(layer, results):
+                if key in records:
+                    continue
+                records[key] = (column, score)
+                for col, piece in moves:
+                    board.play(col, piece)
+                board.play(column, 2)
+                if not board.terminal_node():
+                    for reply in board.empty_col():
+                        board.play(reply, 1)
+                        if not board.terminal_node():
+                            next_layer.append(moves + [(column, 2), (reply, 1)])
+                        board.undo()
+                while board.moves:
+                    board.undo()
+            layer = next_layer
+            print("%d positions" % len(records))
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, board.get_row_board(), board.get_col_board(),
+                            plies, depth, len(records)))
+        for key in sorted(records):
+            column, score = records[key]
+            f.write(RECORD.pack(key, column, score))
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the opening book of the hard level.")
+    parser.add_argument("--plies", type=int, default=6, help="plies covered by the book (default 6)")
+    parser.add_argument("--depth", type=int, default=10, help="search depth per position (default 10)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPUs)")
+    parser.add_argument("--output", default=DEFAULT_BOOK, help="book file (default opening_book.bin)")
+    args = parser.parse_args()
+    count = generate_book(args.output, args.plies, args.depth, args.workers)
+    print("wrote %d positions to %s" % (count, args.output))
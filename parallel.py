@@ -0,0 +1,276 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from board import *
+from AIOpponent import *
+from transposition import TranspositionTable
+from search_stats import SearchStats
+
+'''
+File: parallel.py. Root-parallel version of the hard level. Every open column at the root
+                   is searched by its own worker process with alpha-beta, and the best
+                   column is picked from the results the same way hard does (leftmost of
+                   the best scores). The worker processes are started once and kept warm
+                   between moves, and each one keeps its own transposition table.
+                   Running the file compares the parallel search with the serial one.
+'''
+
+# transposition table of the worker process, created by init_worker
+worker_table = None
+
+
+'''
+Function: init_worker. Initializer of every worker process.
+Parameters:
+    table_size: number of slots of the transposition table of the worker.
+Return: none
+'''
+
+
+def init_worker(table_size):
+    global worker_table
+    worker_table = TranspositionTable(table_size)
+
+
+'''
+Function: warm_up. Empty task used to start all worker processes ahead of the first move.
+Parameters: none
+Return:
+    pid: process id of the worker.
+'''
+
+
+def warm_up():
+    time.sleep(0.05)
+    return os.getpid()
+
+
+'''
+Function: search_child. Task run by a worker: plays a root column and searches the resulting
+          board state with a full alpha-beta window, so the exact score is returned.
+Parameters:
+    board: board object (a pickled copy of the root board).
+    col: root column to search.
+    ply: depth of tree exploration from the root.
+    maximizer: boolean representation of the maximizer at the root. (True = Maximizer)
+    wall_deadline: time.time() value after which the search gives up (optional).
+    collect_stats: count the search in a SearchStats object. Default is False.
+Return:
+    col: root column that was searched.
+    score: score of the column, or None if the search ran out of time.
+    stats: SearchStats object with the counters of the search and the principal variation
+           starting with the column (also when the search ran out of time), or None.
+'''
+
+
+def search_child(board, col, ply, maximizer, wall_deadline=None, collect_stats=False):
+    deadline = None
+    if wall_deadline is not None:
+        deadline = time.perf_counter() + (wall_deadline - time.time())
+    stats = None
+    if collect_stats:
+        stats = SearchStats()
+    worker_table.new_search()
+    if maximizer:
+        board.play(col, 2)
+    else:
+        board.play(col, 1)
+    try:
+        score = alpha_beta(board, ply - 1, float('-inf'), float('inf'), not maximizer,
+                           worker_table, deadline, stats)
+    except SearchTimeout:
+        return col, None, stats
+    board.undo()
+    if stats is not None:
+        stats.pv = principal_variation(board, col, ply, maximizer, worker_table)
+    return col, score, stats
+
+
+'''
+ParallelSearch Class: Pool of worker processes that search the root columns of the hard
+                      level in parallel. Create it once per game and reuse it for every move.
+'''
+
+
+class ParallelSearch:
+
+    '''
+    Method: ParallelSearch constructor. Starts the worker processes.
+    Parameters:
+        workers: number of worker processes. Default is the number of CPUs.
+        table_size: number of slots of the transposition table of each worker.
+    Return: none
+    '''
+
+    def __init__(self, workers=None, table_size=1 << 16):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                            initargs=(table_size,))
+        for future in [self.executor.submit(warm_up) for i in range(self.workers)]:
+            future.result()
+
+    '''
+    Method: search_depth. Searches all root columns at one depth. Has the arguments of hard
+            that hard_timed passes to its search function, so hard_timed can deepen with it.
+    Parameters:
+        board: board object.
+        ply: depth of tree exploration.
+        maximizer: boolean representation of the maximizer. (True = Maximizer)
+        deadline: time.perf_counter() value after which the search gives up (optional).
+        best: column to submit first, e.g. the answer of a shallower search (optional).
+        stats: SearchStats object; gets the counters of the workers, the time of the depth
+               and the principal variation (optional).
+    Return:
+        column: best column.
+        score: score of the best column.
+    Raises:
+        SearchTimeout: if any column ran out of time.
+    '''
+
+    def search_depth(self, board, ply, maximizer, deadline=None, best=None, stats=None):
+        start = time.perf_counter()
+        # the workers get the deadline as wall clock time, which all processes share
+        wall_deadline = None
+        if deadline is not None:
+            wall_deadline = time.time() + (deadline - start)
+        columns = board.empty_col()
+        futures = [self.executor.submit(search_child, board, col, ply, maximizer, wall_deadline, stats is not None)
+                   for col in order_moves(board, 2 if maximizer else 1, best)]
+        scores = {}
+        lines = {}
+        nodes = 0
+        for future in as_completed(futures):
+            col, score, child_stats = future.result()
+            if child_stats is not None:
+                stats.add(child_stats)
+                nodes += child_stats.nodes
+                lines[col] = child_stats.pv
+            if score is None:
+                for other in futures:
+                    other.cancel()
+                raise SearchTimeout()
+            scores[col] = score
+
+        column = columns[0]
+        for col in columns:
+            if (maximizer and scores[col] > scores[column]) or (not maximizer and scores[col] < scores[column]):
+                column = col
+        if stats is not None:
+            stats.record_depth(ply, time.perf_counter() - start, nodes, column, scores[column])
+            stats.pv = lines[column]
+        return column, scores[column]
+
+    '''
+    Method: search. Parallel version of hard: same column and score as hard(board, ply, maximizer).
+    Parameters:
+        board: board object.
+        ply: depth of tree exploration.
+        maximizer: boolean representation of the maximizer. (True = Maximizer)
+        book: OpeningBook object; positions in the book are answered without a search (optional).
+        solver: Solver object; positions with solver.endgame_cells empty cells or fewer are
+                solved exactly instead (optional).
+        stats: SearchStats object; gets the counters of the workers, as in hard (optional).
+    Return:
+        column: column position that will yield the next best step.
+        score: score obtained from the search.
+    '''
+
+    def search(self, board, ply, maximizer, book=None, solver=None, stats=None):
+        if ply == 0 or board.terminal_node():
+            return hard(board, ply, maximizer)
+        shortcut = shortcut_move(board, maximizer, book, solver, stats)
+        if shortcut is not None:
+            return shortcut[0], shortcut[1]
+        return self.search_depth(board, ply, maximizer, stats=stats)
+
+    '''
+    Method: search_timed. Parallel version of hard_timed: runs the iterative deepening loop of
+            hard_timed with search_depth for every depth from 2 on.
+    Parameters:
+        board: board object.
+        think_ms: time budget of the search in milliseconds.
+        maximizer: boolean representation of the maximizer. (True = Maximizer)
+        max_ply: deepest iteration to run (optional, default is the number of empty cells).
+        book: OpeningBook object; positions in the book are answered without a search (optional).
+        solver: Solver object; positions with solver.endgame_cells empty cells or fewer are
+                solved exactly instead (optional).
+        stats: SearchStats object; gets the counters of all iterations, as in hard_timed
+               (optional).
+    Return:
+        column: column position that will yield the next best step.
+        score: score obtained from the deepest completed search.
+        depth: depth of the deepest completed search (the book depth for book moves, the
+               number of empty cells for solved positions).
+    '''
+
+    def search_timed(self, board, think_ms, maximizer, max_ply=None, book=None, solver=None, stats=None):
+        return hard_timed(board, think_ms, maximizer, max_ply=max_ply, book=book, solver=solver, stats=stats,
+                          search=self.search_depth)
+
+    '''
+    Method: close. Stops the worker processes.
+    Parameters: none
+    Return: none
+    '''
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+'''
+Function: report_speedup. Times the serial hard search and the parallel search at the same
+          depth on a set of random midgame positions and prints the speedup. Both searches
+          must agree on every column and score.
+Parameters:
+    ply: depth of tree exploration.
+    workers: number of worker processes.
+    positions: number of positions to search.
+    seed: seed of the random positions.
+Return:
+    speedup: serial time divided by parallel time.
+'''
+
+
+def report_speedup(ply, workers, positions, seed=0):
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < positions:
+        board = Board()
+        piece = 2
+        for move in range(rng.randint(4, 14)):
+            board.play(rng.choice(board.empty_col()), piece)
+            piece = 1 if piece == 2 else 2
+        if not board.terminal_node():
+            boards.append(board)
+
+    search = ParallelSearch(workers)
+    serial_time = 0
+    parallel_time = 0
+    for board in boards:
+        start = time.perf_counter()
+        serial = hard(board, ply, True, TranspositionTable(1 << 16))
+        serial_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        parallel = search.search(board, ply, True)
+        parallel_time += time.perf_counter() - start
+
+        if serial != parallel:
+            raise AssertionError("parallel search returned %s, serial %s" % (parallel, serial))
+    search.close()
+
+    speedup = serial_time / parallel_time
+    print("ply %d, %d positions, %d workers: serial %.2fs, parallel %.2fs, speedup %.2fx"
+          % (ply, positions, workers, serial_time, parallel_time, speedup))
+    return speedup
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the parallel hard search with the serial one.")
+    parser.add_argument("--ply", type=int, default=6, help="search depth (default 6)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: CPUs)")
+    parser.add_argument("--positions", type=int, default=10, help="number of positions (default 10)")
+    args = parser.parse_args()
+    report_speedup(args.ply, args.workers, args.positions)
@@ -0,0 +1,129 @@
+'''
+File: search_stats.py. Statistics of the hard level search. A SearchStats object is passed to
+                       hard, hard_timed and alpha_beta (stats=...) and is filled in while the
+                       search runs; without one the search only pays for a few "is None" checks.
+'''
+
+
+'''
+SearchStats Class: Counters of one move's search: nodes (positions visited by alpha_beta),
+                   leaves (positions scored at depth 0), terminals (won or drawn positions),
+                   cutoffs (branches cut off by alpha-beta), cache hits (positions answered by
+                   the transposition table), the time of every completed depth, the time of
+                   the whole search (aborted iterations included) and the principal
+                   variation of the deepest one.
+'''
+
+
+class SearchStats:
+
+    '''
+    Method: SearchStats constructor.
+    Parameters: none
+    Return: none
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    '''
+    Method: reset. Clears all counters before the next search.
+    Parameters: none
+    Return: none
+    '''
+
+    def reset(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.terminals = 0
+        self.cutoffs = 0
+        self.cache_hits = 0
+        self.depths = []
+        self.seconds = 0.0
+        self.pv = []
+        self.source = "search"
+
+    '''
+    Method: add. Adds the counters of another search, e.g. the search of a root column in a
+            worker process.
+    Parameters:
+        other: SearchStats object.
+    Return: none
+    '''
+
+    def add(self, other):
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.terminals += other.terminals
+        self.cutoffs += other.cutoffs
+        self.cache_hits += other.cache_hits
+
+    '''
+    Method: record_depth. Records a completed depth of the search.
+    Parameters:
+        depth: depth of tree exploration.
+        seconds: time the depth took.
+        nodes: nodes visited at this depth.
+        column: best column found at this depth.
+        score: score of the column.
+    Return: none
+    '''
+
+    def record_depth(self, depth, seconds, nodes, column, score):
+        self.depths.append((depth, seconds, nodes, column, score))
+        self.seconds += seconds
+
+    '''
+    Method: record_timeout. Records the time of an iteration that ran out of time. Its nodes
+            are already counted, so the time has to count as well.
+    Parameters:
+        seconds: time the iteration took until it was dropped.
+    Return: none
+    '''
+
+    def record_timeout(self, seconds):
+        self.seconds += seconds
+
+    '''
+    Method: get_stats. Statistics as a dictionary.
+    Parameters: none
+    Return:
+        stats: dictionary with source ("search", "book", "solver", "ponder" or "parallel"),
+               nodes, leaves, terminals, cutoffs, cache_hits, seconds (the whole search,
+               iterations that ran out of time included), nodes_per_sec,
+               depths (list of dictionaries with depth, seconds, nodes, column and score)
+               and pv (list of columns).
+    '''
+
+    def get_stats(self):
+        return {
+            "source": self.source,
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "terminals": self.terminals,
+            "cutoffs": self.cutoffs,
+            "cache_hits": self.cache_hits,
+            "seconds": self.seconds,
+            "nodes_per_sec": self.nodes / self.seconds if self.seconds > 0 else 0.0,
+            "depths": [{"depth": depth, "seconds": time, "nodes": nodes, "column": column, "score": score}
+                       for depth, time, nodes, column, score in self.depths],
+            "pv": list(self.pv),
+        }
+
+    '''
+    Method: summary. One line summary of the statistics, for logging.
+    Parameters: none
+    Return:
+        line: summary text.
+    '''
+
+    def summary(self):
+        stats = self.get_stats()
+        line = "%s: %d nodes (%d leaves, %d terminals, %d cutoffs, %d cache hits) in %.1f ms" % (
+            stats["source"], stats["nodes"], stats["leaves"], stats["terminals"], stats["cutoffs"],
+            stats["cache_hits"], stats["seconds"] * 1000)
+        if self.depths:
+            line += ", depths " + " ".join("%d:%.1fms" % (depth, time * 1000) for depth, time, _, _, _ in self.depths)
+        if self.pv:
+            line += ", pv " + " ".join(str(col) for col in self.pv)
+        return line
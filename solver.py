@@ -0,0 +1,268 @@
+from board import *
+from transposition import TranspositionTable, LOWER, UPPER
+
+'''
+File: solver.py. Exact solver of the game, used for the endgame of the hard level and for
+                 the perfect level. Negamax with alpha-beta on raw bitboards, a transposition
+                 table and null-window searches: instead of searching for the exact score in
+                 one go, the score is found by a binary search of yes/no questions ("is the
+                 score above x?"), each of which prunes a lot more than a wide window.
+
+                 Scores follow the usual convention: 0 is a draw, a positive score is a win
+                 for the side to move and a negative score a loss. The sooner the win, the
+                 higher the score, so the score also gives the distance to the result.
+'''
+
+WIN = "win"
+LOSS = "loss"
+DRAW = "draw"
+
+
+'''
+Solver Class: Exact solver for one board size. Keeps its transposition table between calls,
+              so consecutive moves of the same game reuse earlier work.
+'''
+
+
+class Solver:
+
+    '''
+    Method: Solver constructor. Precomputes the bitboard masks of the board size.
+    Parameters:
+        row_board: number of rows of the board. Default is 6.
+        col_board: number of columns of the board. Default is 7.
+        table_size: number of slots of the transposition table.
+        endgame_cells: the hard level hands over to the solver once the board has this many
+                       empty cells or fewer. Default is 16.
+        connect: number of pieces in a row needed to win. Default is 4.
+    Return: none
+    '''
+
+    def __init__(self, row_board=6, col_board=7, table_size=1 << 20, endgame_cells=16, connect=4):
+        self.row_board = row_board
+        self.col_board = col_board
+        self.connect = connect
+        self.cells = row_board * col_board
+        self.stride = row_board + 1
+        self.bottom = sum(1 << (col * self.stride) for col in range(col_board))
+        self.full = (self.bottom << row_board) - self.bottom
+        self.column_masks = [((1 << row_board) - 1) << (col * self.stride) for col in range(col_board)]
+        self.order = center_order(col_board)
+
+        # keys are mixed in 64 bits like the Zobrist hashes; boards with more bits keep
+        # all of them, so two positions never share a key
+        self.key_bits = max(64, self.stride * col_board)
+        self.key_mask = (1 << self.key_bits) - 1
+        self.table = TranspositionTable(table_size)
+        self.endgame_cells = endgame_cells
+        self.nodes = 0
+
+    '''
+    Method: non_losing_moves. Playable cells that do not hand the opponent a win on the next
+            move: if the opponent threatens to win, the threat has to be blocked (two threats
+            cannot both be blocked), and a piece is never dropped right under a winning cell
+            of the opponent.
+    Parameters:
+        current: bitboard of the side to move.
+        mask: bitboard of all occupied cells.
+    Return:
+        cells: bitboard of the playable cells that do not lose at once.
+    '''
+
+    def non_losing_moves(self, current, mask):
+        possible = (mask + self.bottom) & self.full
+        threats = open_threats(current ^ mask, self.full ^ mask, self.stride, self.connect)
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):
+                return 0
+            possible = forced
+        return possible & ~(threats >> 1)
+
+    '''
+    Method: negamax. Null-window alpha-beta search of a position where the side to move
+            cannot win at once. Only moves from non_losing_moves are searched; moves creating
+            the most threats go first.
+    Parameters:
+        current: bitboard of the side to move.
+        mask: bitboard of all occupied cells.
+        moves: number of pieces on the board.
+        alpha: lower end of the window.
+        beta: upper end of the window.
+    Return:
+        score: score of the position for the side to move (fail-soft bounds as in alpha_beta).
+    '''
+
+    def negamax(self, current, mask, moves, alpha, beta):
+        self.nodes += 1
+        possible = self.non_losing_moves(current, mask)
+        if not possible:
+            return -((self.cells - moves) // 2)
+        if moves >= self.cells - 2:
+            return 0
+
+        low = -((self.cells - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        high = (self.cells - 1 - moves) // 2
+
+        key = current + mask + self.bottom
+        key = (key * 0x9E3779B97F4A7C15) & self.key_mask
+        key ^= key >> (self.key_bits // 2)
+        entry = self.table.probe(key)
+        if entry is not None:
+            if entry[2] == UPPER:
+                if entry[3] < high:
+                    high = entry[3]
+                    if beta > high:
+                        beta = high
+                        if alpha >= beta:
+                            return beta
+            elif entry[3] > alpha:
+                alpha = entry[3]
+                if alpha >= beta:
+                    return alpha
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        candidates = []
+        for col in self.order:
+            move = possible & self.column_masks[col]
+            if move:
+                threat_count = bin(open_threats(current | move, self.full ^ (mask | move), self.stride,
+                                                self.connect)).count("1")
+                candidates.append((threat_count, -len(candidates), move))
+        candidates.sort(reverse=True)
+
+        for threat_count, rank, move in candidates:
+            score = -self.negamax(current ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.table.store(key, 0, LOWER, score, None)
+                return score
+            if score > alpha:
+                alpha = score
+        self.table.store(key, 0, UPPER, alpha, None)
+        return alpha
+
+    '''
+    Method: score_position. Exact score of a position, found with null-window searches.
+    Parameters:
+        current: bitboard of the side to move.
+        mask: bitboard of all occupied cells.
+        moves: number of pieces on the board.
+    Return:
+        score: exact score of the position for the side to move.
+    '''
+
+    def score_position(self, current, mask, moves):
+        possible = (mask + self.bottom) & self.full
+        if open_threats(current, self.full ^ mask, self.stride, self.connect) & possible:
+            return (self.cells + 1 - moves) // 2
+        low = -((self.cells - moves) // 2)
+        high = (self.cells + 1 - moves) // 2
+        while low < high:
+            middle = low + (high - low) // 2
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            result = self.negamax(current, mask, moves, middle, middle + 1)
+            if result <= middle:
+                high = result
+            else:
+                low = result
+        return low
+
+    '''
+    Method: outcome. Turns a score into a result and the number of moves (plies, both sides
+            counted) until the game ends with that result if both sides play perfectly.
+    Parameters:
+        score: score of the position for the side to move.
+        moves: number of pieces on the board.
+    Return:
+        result: WIN, LOSS or DRAW for the side to move.
+        distance: plies until the winning piece is dropped or the board is full.
+    '''
+
+    def outcome(self, score, moves):
+        if score == 0:
+            return DRAW, self.cells - moves
+        if score > 0:
+            result = WIN
+            parity = (moves + 1) % 2
+        else:
+            result = LOSS
+            parity = moves % 2
+        end = self.cells + 2 - 2 * abs(score)
+        if end % 2 != parity:
+            end -= 1
+        return result, end - moves
+
+    '''
+    Method: solve. Solves a board object for the piece to move and finds a move that keeps
+            the exact score.
+    Parameters:
+        board: board object (with the same size as the solver).
+        piece: numerical representation of the agent to move.
+    Return:
+        column: best column.
+        result: WIN, LOSS or DRAW for the piece to move.
+        distance: plies until the result is reached with perfect play.
+    '''
+
+    def solve(self, board, piece):
+        current = board.pieces[piece]
+        mask = board.mask
+        moves = bin(mask).count("1")
+        score = self.score_position(current, mask, moves)
+        result, distance = self.outcome(score, moves)
+
+        possible = (mask + self.bottom) & self.full
+        wins = open_threats(current, self.full ^ mask, self.stride, self.connect) & possible
+        safe = self.non_losing_moves(current, mask)
+        for col in self.order:
+            if wins & self.column_masks[col]:
+                return col, result, distance
+        for col in self.order:
+            move = safe & self.column_masks[col]
+            if not move:
+                continue
+            if moves + 1 == self.cells:
+                return col, result, distance
+            # the move keeps the score if the opponent cannot do better than -score
+            value = -self.negamax(current ^ mask, mask | move, moves + 1, -score, -score + 1)
+            if value >= score:
+                return col, result, distance
+        # every move loses at once
+        for col in self.order:
+            if possible & self.column_masks[col]:
+                return col, result, distance
+
+    '''
+    Method: get_stats. Counters of the solver.
+    Parameters: none
+    Return:
+        stats: dictionary with the number of searched nodes and the table counters.
+    '''
+
+    def get_stats(self):
+        stats = {"nodes": self.nodes}
+        stats.update(self.table.get_stats())
+        return stats
+
+
+'''
+Function: empty_cells. Number of empty cells of a board object.
+Parameters:
+    board: board object.
+Return:
+    cells: number of empty cells.
+'''
+
+
+def empty_cells(board):
+    return board.get_row_board() * board.get_col_board() - bin(board.mask).count("1")
@@ -0,0 +1,126 @@
+import random
+import numpy as np
+import pytest
+from board import *
+from AIOpponent import *
+from transposition import TranspositionTable
+
+'''
+File: test_evaluation.py. Checks the fast evaluations and the hard search against their
+                          reference implementations: the incremental Board.get_score,
+                          batch_scoring and vector_scoring against scoring, and hard against
+                          plain minimax. Random games are played on the standard board and
+                          on a connect 5 board, and every ply is checked. Run with pytest.
+'''
+
+# (rows, columns, connect) of the boards the games are played on
+SIZES = [(6, 7, 4), (6, 8, 5)]
+GAMES = 3
+
+
+'''
+Function: random_games. Plays random games and yields the board after every move. Games end
+          when a piece wins or the board is full.
+Parameters:
+    size: (rows, columns, connect) of the board.
+    seed: seed of the random moves.
+Return:
+    generator of (board, piece to move) pairs; the board is the same object every time.
+'''
+
+
+def random_games(size, seed):
+    rng = random.Random(seed)
+    for game in range(GAMES):
+        board = Board(*size)
+        piece = 1
+        yield board, piece
+        while not board.terminal_node():
+            board.play(rng.choice(board.empty_col()), piece)
+            piece = 3 - piece
+            yield board, piece
+
+
+'''
+Function: minimax. Plain minimax without pruning or tables, as hard was written before the
+          search got faster. Leaves are scored with scoring; among equally scored columns the
+          leftmost one is kept.
+Parameters:
+    board: board object.
+    ply: depth of tree exploration.
+    maximizer: boolean representation of the maximizer. (True = Maximizer)
+Return:
+    column: best column (None for a leaf).
+    score: score of the board state.
+'''
+
+
+def minimax(board, ply, maximizer):
+    if board.terminal_node():
+        if board.winning_move(1):
+            return None, float('-inf')
+        if board.winning_move(2):
+            return None, float('inf')
+        return None, 0
+    if ply == 0:
+        return None, scoring(board, 2)
+
+    columns = board.empty_col()
+    column = columns[0]
+    score = float('-inf') if maximizer else float('inf')
+    for col in columns:
+        board.play(col, 2 if maximizer else 1)
+        value = minimax(board, ply - 1, not maximizer)[1]
+        board.undo()
+        if (maximizer and value > score) or (not maximizer and value < score):
+            score = value
+            column = col
+    return column, score
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_incremental_score_matches_scoring(size):
+    for board, piece in random_games(size, 1):
+        assert board.get_score(1) == scoring(board, 1)
+        assert board.get_score(2) == scoring(board, 2)
+        # every child, then back to the same position
+        for col in board.empty_col():
+            board.play(col, piece)
+            assert board.get_score(piece) == scoring(board, piece)
+            assert board.get_score(3 - piece) == scoring(board, 3 - piece)
+            board.undo()
+        assert board.get_score(1) == scoring(board, 1)
+        assert board.get_score(2) == scoring(board, 2)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_vector_scoring_matches_scoring(size):
+    for board, piece in random_games(size, 2):
+        assert vector_scoring(board, 1) == scoring(board, 1)
+        assert vector_scoring(board, 2) == scoring(board, 2)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_batch_scoring_matches_scoring(size):
+    for board, piece in random_games(size, 3):
+        children = []
+        expected = []
+        for col in board.empty_col():
+            board.play(col, piece)
+            children.append(np.array(board.get_board()))
+            expected.append(scoring(board, piece))
+            board.undo()
+        if children:
+            assert batch_scoring(children, piece, size[2]).tolist() == expected
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_hard_matches_minimax(size):
+    table = TranspositionTable(1 << 12)
+    for board, piece in random_games(size, 4):
+        if board.terminal_node():
+            continue
+        maximizer = piece == 2
+        expected = minimax(board, 3, maximizer)
+        assert hard(board, 3, maximizer) == expected
+        assert hard(board, 3, maximizer, table) == expected
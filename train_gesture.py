@@ -0,0 +1,239 @@
+import argparse
+import os
+import time
+import numpy as np
+from gesture import (BASE_DIR, LANDMARKS, WEIGHTS_FILE, GestureClassifier, load_class_names,
+                     normalize_landmarks)
+from gesture_data import DATASET_DIR, load_dataset
+
+'''
+File: train_gesture.py. Trains a small gesture classifier on the samples of data.pickle (the
+                        converted dataset of gesture_data.py). The landmarks are normalized
+                        (wrist-relative and scale-invariant, see normalize_landmarks), so a
+                        much smaller network than mp_hand_gesture is enough. The network is a
+                        stack of dense layers with ReLU and a softmax output, trained with
+                        mini-batch Adam in NumPy, so training needs neither TensorFlow nor any
+                        other framework and gives the same model for the same seed.
+
+                        The model is exported in the .npz format of GestureClassifier
+                        (optionally with int8 kernels), so the game loads it with
+                        --gesture-model. The script reports the held-out accuracy of the new
+                        model and of the current one, the inference latency and the model size.
+'''
+
+DEFAULT_MODEL = os.path.join(BASE_DIR, "gesture_small.npz")
+
+
+'''
+Function: split_dataset. Stratified split into training and held-out samples: the same
+          fraction of every class is held out.
+Parameters:
+    labels: label array.
+    test_fraction: fraction of the samples held out.
+    seed: seed of the split.
+Return:
+    train: indices of the training samples.
+    test: indices of the held-out samples.
+'''
+
+
+def split_dataset(labels, test_fraction, seed):
+    rng = np.random.default_rng(seed)
+    train = []
+    test = []
+    for label in np.unique(labels):
+        indices = rng.permutation(np.flatnonzero(labels == label))
+        held_out = int(round(len(indices) * test_fraction))
+        test.append(indices[:held_out])
+        train.append(indices[held_out:])
+    return np.sort(np.concatenate(train)), np.sort(np.concatenate(test))
+
+
+'''
+Function: forward_pass. Forward pass of the network, keeping the activations of every layer
+          for the backward pass.
+Parameters:
+    inputs: float32 array of shape (batch, 42).
+    kernels: list of kernels.
+    biases: list of biases.
+Return:
+    activations: list with the inputs and the output of every layer (softmax for the last).
+'''
+
+
+def forward_pass(inputs, kernels, biases):
+    activations = [inputs]
+    last = len(kernels) - 1
+    for layer in range(len(kernels)):
+        values = activations[-1] @ kernels[layer] + biases[layer]
+        if layer < last:
+            values = np.maximum(values, 0)
+        else:
+            values = np.exp(values - values.max(axis=1, keepdims=True))
+            values /= values.sum(axis=1, keepdims=True)
+        activations.append(values)
+    return activations
+
+
+'''
+Function: train_model. Trains the network with mini-batch Adam on the cross-entropy loss
+          with L2 weight decay.
+Parameters:
+    inputs: float32 array of shape (N, 42).
+    labels: label array of shape (N,).
+    hidden: sizes of the hidden layers.
+    classes: number of classes.
+    epochs: number of passes over the training samples.
+    batch_size: samples per update.
+    learning_rate: Adam step size.
+    weight_decay: L2 penalty of the kernels.
+    seed: seed of the initial weights and of the sample order.
+Return:
+    kernels: list of float32 kernels.
+    biases: list of float32 biases.
+'''
+
+
+def train_model(inputs, labels, hidden, classes, epochs=300, batch_size=64, learning_rate=0.003,
+                weight_decay=1e-4, seed=0):
+    rng = np.random.default_rng(seed)
+    sizes = [inputs.shape[1]] + list(hidden) + [classes]
+    kernels = [(rng.standard_normal((n_in, n_out)) * np.sqrt(2 / n_in)).astype(np.float32)
+               for n_in, n_out in zip(sizes[:-1], sizes[1:])]
+    biases = [np.zeros(n_out, dtype=np.float32) for n_out in sizes[1:]]
+    parameters = kernels + biases
+    moments = [np.zeros_like(p) for p in parameters]
+    velocities = [np.zeros_like(p) for p in parameters]
+    targets = np.eye(classes, dtype=np.float32)[labels]
+    beta1, beta2 = 0.9, 0.999
+    step = 0
+
+    for epoch in range(epochs):
+        order = rng.permutation(len(inputs))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            activations = forward_pass(inputs[batch], kernels, biases)
+
+            # softmax with cross-entropy: the gradient of the logits is output - target
+            delta = (activations[-1] - targets[batch]) / len(batch)
+            kernel_grads = [None] * len(kernels)
+            bias_grads = [None] * len(kernels)
+            for layer in reversed(range(len(kernels))):
+                kernel_grads[layer] = activations[layer].T @ delta + weight_decay * kernels[layer]
+                bias_grads[layer] = delta.sum(axis=0)
+                if layer > 0:
+                    delta = (delta @ kernels[layer].T) * (activations[layer] > 0)
+
+            step += 1
+            for parameter, grad, moment, velocity in zip(parameters, kernel_grads + bias_grads, moments, velocities):
+                moment *= beta1
+                moment += (1 - beta1) * grad
+                velocity *= beta2
+                velocity += (1 - beta2) * grad * grad
+                corrected = moment / (1 - beta1 ** step)
+                parameter -= learning_rate * corrected / (np.sqrt(velocity / (1 - beta2 ** step)) + 1e-8)
+    return kernels, biases
+
+
+'''
+Function: export_model. Writes a trained model in the format of GestureClassifier.
+Parameters:
+    path: .npz file to write.
+    kernels: list of kernels.
+    biases: list of biases.
+    quantize: store the kernels as int8 with one float scale per output unit. Default is False.
+Return: none
+'''
+
+
+def export_model(path, kernels, biases, quantize=False):
+    arrays = {"normalize": np.array(1, dtype=np.uint8)}
+    for layer, (kernel, bias) in enumerate(zip(kernels, biases)):
+        if quantize:
+            scale = np.abs(kernel).max(axis=0) / 127
+            scale[scale == 0] = 1
+            arrays["kernel_%d" % layer] = np.round(kernel / scale).astype(np.int8)
+            arrays["kernel_scale_%d" % layer] = scale.astype(np.float32)
+        else:
+            arrays["kernel_%d" % layer] = kernel
+        arrays["bias_%d" % layer] = bias
+    np.savez(path, **arrays)
+
+
+'''
+Function: measure_latency. Time of one classification the way the game runs it (landmarks
+          already in the input buffer, one forward pass).
+Parameters:
+    classifier: GestureClassifier object.
+    landmarks: int16 array of shape (N, 21, 2) to classify one at a time.
+    repeat: number of passes over the landmarks.
+Return:
+    microseconds: average time of one classification in microseconds.
+'''
+
+
+def measure_latency(classifier, landmarks, repeat=5):
+    samples = np.asarray(landmarks, dtype=np.float64)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for points in samples:
+            if classifier.normalize:
+                normalize_landmarks(points, out=classifier.landmarks)
+            else:
+                classifier.landmarks[...] = points
+            classifier.forward().argmax()
+    return (time.perf_counter() - start) / (repeat * len(samples)) * 1e6
+
+
+'''
+Function: report_model. Prints the held-out accuracy, latency and size of a model file.
+Parameters:
+    name: name of the model in the report.
+    path: .npz file of the model.
+    landmarks: held-out landmarks.
+    labels: held-out labels.
+Return:
+    accuracy: held-out accuracy.
+'''
+
+
+def report_model(name, path, landmarks, labels):
+    classifier = GestureClassifier(path)
+    accuracy = float((classifier.predict(landmarks).argmax(axis=1) == labels).mean())
+    latency = measure_latency(classifier, landmarks[:500])
+    parameters = sum(kernel.size + bias.size for kernel, bias in zip(classifier.kernels, classifier.biases))
+    print("%-22s accuracy %.2f%%, %.1f us per frame, %d parameters, %d bytes"
+          % (name, accuracy * 100, latency, parameters, os.path.getsize(path)))
+    return accuracy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train a small gesture classifier on the gesture dataset.")
+    parser.add_argument("--data", default=DATASET_DIR, help="dataset directory (default gesture_data)")
+    parser.add_argument("--hidden", default="32", help="comma separated hidden layer sizes (default 32)")
+    parser.add_argument("--epochs", type=int, default=300, help="training epochs (default 300)")
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="held-out fraction (default 0.2)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the split and the training (default 0)")
+    parser.add_argument("--quantize", action="store_true", help="store the kernels as int8")
+    parser.add_argument("--output", default=DEFAULT_MODEL, help="model file (default gesture_small.npz)")
+    args = parser.parse_args()
+    hidden = [int(size) for size in args.hidden.split(",") if size]
+    if any(size < 1 for size in hidden):
+        parser.error("--hidden sizes must be at least 1")
+    if not 0 < args.test_fraction < 1:
+        parser.error("--test-fraction must be between 0 and 1")
+
+    landmarks, labels = load_dataset(args.data)
+    labels = np.asarray(labels, dtype=np.int64)
+    train, test = split_dataset(labels, args.test_fraction, args.seed)
+    inputs = normalize_landmarks(landmarks[train]).reshape(len(train), LANDMARKS * 2)
+
+    start = time.perf_counter()
+    kernels, biases = train_model(inputs, labels[train], hidden, len(load_class_names()),
+                                  epochs=args.epochs, seed=args.seed)
+    print("trained %s on %d samples in %.1f s" % (args.hidden, len(train), time.perf_counter() - start))
+    export_model(args.output, kernels, biases, args.quantize)
+
+    print("held-out: %d samples" % len(test))
+    report_model("mp_hand_gesture", WEIGHTS_FILE, landmarks[test], labels[test])
+    report_model(os.path.basename(args.output), args.output, landmarks[test], labels[test])
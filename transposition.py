@@ -0,0 +1,148 @@
+'''
+File: transposition.py. Transposition table used by the hard level of the game. Different
+                        move orders often reach the same board state; the table remembers
+                        the result of a search so a position is only searched once per depth.
+'''
+
+# bound types of a stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# XOR-ed into the Zobrist hash of the board when the minimizer is to move, so the
+# same board with a different side to move gets a different entry.
+SIDE_KEY = 0x9E3779B97F4A7C15
+
+
+'''
+TranspositionTable Class: Fixed size hash table of search results keyed by the Zobrist hash
+                          of the board. The number of slots is set once when the table is
+                          created (rounded down to a power of two), so the memory used by
+                          the table never grows during a long session. Every slot holds one
+                          entry: (key, depth, bound, value, move, generation).
+'''
+
+
+class TranspositionTable:
+
+    '''
+    Method: TranspositionTable constructor.
+    Parameters:
+        size: number of slots of the table. Default is 2^18 slots (roughly 30 MB once full).
+    Return: none
+    '''
+
+    def __init__(self, size=1 << 18):
+        slots = 1
+        while slots * 2 <= size:
+            slots *= 2
+        self.size = slots
+        self.index_mask = slots - 1
+        self.slots = [None] * slots
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    '''
+    Method: new_search. Starts a new search generation. Entries from older generations are
+            replaced first, so results of earlier moves do not block the table.
+    Parameters: none
+    Return: none
+    '''
+
+    def new_search(self):
+        self.generation += 1
+
+    '''
+    Method: clear. Empties the table and resets the counters.
+    Parameters: none
+    Return: none
+    '''
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    '''
+    Method: probe. Looks up a position.
+    Parameters:
+        key: hash of the position.
+    Return:
+        entry: (key, depth, bound, value, move, generation) if the position is stored.
+        None: if the position is not in the table.
+    '''
+
+    def probe(self, key):
+        entry = self.slots[key & self.index_mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    '''
+    Method: peek. Looks up a position like probe, but does not count as a hit or miss. Used
+            for lookups outside of the search (e.g. the principal variation), so the hit rate
+            only measures the search.
+    Parameters:
+        key: hash of the position.
+    Return:
+        entry: (key, depth, bound, value, move, generation) if the position is stored.
+        None: if the position is not in the table.
+    '''
+
+    def peek(self, key):
+        entry = self.slots[key & self.index_mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    '''
+    Method: store. Stores the result of a search. Replacement policy: an empty slot, the
+            same position or an entry from an older generation is always overwritten;
+            otherwise the new entry only replaces one that was searched less deep.
+    Parameters:
+        key: hash of the position.
+        depth: remaining depth the position was searched with.
+        bound: EXACT, LOWER (value is a lower bound) or UPPER (value is an upper bound).
+        value: score found by the search.
+        move: best column found by the search (or None).
+    Return: none
+    '''
+
+    def store(self, key, depth, bound, value, move):
+        index = key & self.index_mask
+        entry = self.slots[index]
+        if entry is not None:
+            if entry[0] != key and entry[5] == self.generation and entry[1] > depth:
+                return
+            if entry[0] != key:
+                self.replacements += 1
+        self.slots[index] = (key, depth, bound, value, move, self.generation)
+        self.stores += 1
+
+    '''
+    Method: get_stats. Counters used to size the table.
+    Parameters: none
+    Return:
+        stats: dictionary with the size, number of used slots, hits, misses, hit rate,
+               stores and replacements of the table.
+    '''
+
+    def get_stats(self):
+        probes = self.hits + self.misses
+        return {
+            "size": self.size,
+            "used": self.size - self.slots.count(None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / probes if probes else 0.0,
+            "stores": self.stores,
+            "replacements": self.replacements,
+        }